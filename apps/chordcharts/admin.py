@@ -5,6 +5,28 @@ from .models import (
     Chart, Section, Line, Measure, Chord, ChordType, Note,
     Key, TimeSignature
 )
+from .revisions import revision_batch
+
+
+class RevisionBatchAdminMixin():
+    """
+    Runs the views that save or delete objects in charts, including the
+    actions in the change list, in a `revision_batch()`, so that the
+    inlines and delete cascades bump the revisions and repack the
+    measures once.
+    """
+
+    def changeform_view(self, *args, **kwargs):
+        with revision_batch():
+            return super().changeform_view(*args, **kwargs)
+
+    def delete_view(self, *args, **kwargs):
+        with revision_batch():
+            return super().delete_view(*args, **kwargs)
+
+    def changelist_view(self, *args, **kwargs):
+        with revision_batch():
+            return super().changelist_view(*args, **kwargs)
 
 
 class ChordInline(admin.StackedInline):
@@ -12,7 +34,7 @@ class ChordInline(admin.StackedInline):
     extra = 0
 
 
-class MeasureAdmin(admin.ModelAdmin):
+class MeasureAdmin(RevisionBatchAdminMixin, admin.ModelAdmin):
     inlines = (ChordInline,)
 
 
@@ -38,7 +60,7 @@ class MeasureInline(admin.StackedInline):
     change.allow_tags = True
 
 
-class LineAdmin(admin.ModelAdmin):
+class LineAdmin(RevisionBatchAdminMixin, admin.ModelAdmin):
     list_display = ('number', 'section')
     inlines = (MeasureInline,)
 
@@ -65,7 +87,7 @@ class LineInline(admin.StackedInline):
     change.allow_tags = True
 
 
-class SectionAdmin(admin.ModelAdmin):
+class SectionAdmin(RevisionBatchAdminMixin, admin.ModelAdmin):
     list_display = ('name', 'chart', 'key', 'number', 'key')
     inlines = (LineInline,)
 
@@ -92,7 +114,7 @@ class SectionInline(admin.StackedInline):
     change.allow_tags = True
 
 
-class ChartAdmin(admin.ModelAdmin):
+class ChartAdmin(RevisionBatchAdminMixin, admin.ModelAdmin):
     list_display = ('song', 'key', 'creation_date', 'owner', 'public')
     inlines = (SectionInline,)
 
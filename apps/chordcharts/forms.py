@@ -3,6 +3,8 @@ from songs.models import Song
 from songs.fields import SongNameField
 from .fields import KeyTonicField, KeyTonalityField
 from .models import Key, ChordType, Chart, Section, Line, Measure, Chord
+from .reference_data import get_reference_data
+from .revisions import revision_batch
 
 
 class CreateChartForm(ModelForm):
@@ -19,13 +21,14 @@ class CreateChartForm(ModelForm):
 
         self.instance.owner = user
         self.instance.song = self.get_song()
-        key = Key.objects.get(
-            tonic=self.cleaned_data['key_tonic'],
-            tonality=self.cleaned_data['key_tonality']
+        key = get_reference_data().key_by_tonic(
+            self.cleaned_data['key_tonic'],
+            int(self.cleaned_data['key_tonality'])
         )
 
-        super().save(*args, **kwargs)
-        self.add_first_section(self.instance, key)
+        with revision_batch():
+            super().save(*args, **kwargs)
+            self.add_first_section(self.instance, key)
 
         return self.instance
 
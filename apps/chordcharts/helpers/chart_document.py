@@ -0,0 +1,462 @@
+from django.db import models
+from rest_framework.exceptions import ValidationError
+
+from ..models import Chart, Section, Line, Measure, Chord
+from ..serializers import (
+    ChartSerializer, SectionSerializer, LineSerializer, MeasureSerializer,
+    ChordSerializer
+)
+from ..revisions import (
+    revision_batch, record_change, record_measure_change,
+    record_progression_change, CHART_LOOKUP, SECTION_CHART_LOOKUP
+)
+
+
+class ChartDocument():
+    """
+    Makes the sections, lines, measures and chords of a chart match a
+    complete chart document, in the shape of `Chart.client_data()`.
+
+    The document is compared with the stored chart, so that only the
+    differences are written:
+
+    - Objects in the document without an `id` are created.
+    - Objects with an `id` are updated, but only the fields that
+      changed, with one UPDATE per model and field.
+    - Objects of the chart that aren't in the document are deleted.
+
+    The stored chart is loaded with one query per model. Chords are
+    created with one `bulk_create()`. The other new objects are saved one
+    by one, because their children need their ids.
+
+    A chord that moves to another measure or gets another number is
+    replaced by a new chord, because the number of a chord is unique in
+    its measure and changing it in place could collide with another
+    chord in the same statement.
+
+    The document should have the shape of the edit document, with all
+    measures of every line numbered from 1 and a chord for every beat
+    group of a measure. The view document leaves out the measures that
+    repeat another line, and applying it would delete them, so it is
+    rejected.
+
+    Raises a `ValidationError` if the document is invalid, before
+    anything is written.
+    """
+
+    # For every level of the chart: the key of the list in the
+    # document, the model, its serializer and the field that refers to
+    # the parent.
+    LEVELS = (
+        ('sections', Section, SectionSerializer, 'chart_id'),
+        ('lines', Line, LineSerializer, 'section_id'),
+        ('measures', Measure, MeasureSerializer, 'line_id'),
+        ('chords', Chord, ChordSerializer, 'measure_id')
+    )
+
+    def __init__(self, chart, document):
+        self.chart = chart
+        self.document = document
+        self.changed = False
+        self.structural = False
+
+    def apply(self):
+        """
+        Applies the document and refreshes the revision of the chart.
+
+        The chart is locked before it is loaded, so that the document is
+        compared with the chart as it is when the changes are written.
+        """
+
+        if not isinstance(self.document, dict):
+            self.fail('', "Document should be an object.")
+
+        with revision_batch():
+
+            list(
+                Chart.objects.select_for_update().filter(id=self.chart.id)
+                .values_list('id', flat=True)
+            )
+            self.chart.refresh_from_db()
+
+            self.load_objects()
+            self.read_document()
+            chart_serializer = self.read_chart()
+
+            if chart_serializer:
+                chart_serializer.save()
+
+            self.delete_chords()
+
+            instances = [self.chart]
+
+            for level, nodes in enumerate(self.nodes):
+                instances = self.save_level(level, nodes, instances)
+
+            self.delete_objects()
+
+            # Bulk creates and updates don't send signals, so record the
+            # change for the whole chart.
+            if self.changed:
+                record_change(CHART_LOOKUP, self.chart.id, self.structural)
+                record_progression_change(
+                    SECTION_CHART_LOOKUP, {self.chart.id}
+                )
+
+        self.chart.refresh_from_db(fields=['revision'])
+
+    def load_objects(self):
+        """
+        Loads the stored sections, lines, measures and chords of the
+        chart, with one query per model.
+        """
+
+        self.objects = [
+            {
+                instance.id: instance
+                for instance in model.objects.filter(chart_id=self.chart.id)
+            }
+            for _, model, _, _ in self.LEVELS
+        ]
+
+    def read_document(self):
+        """
+        Collects the nodes of every level of the document and validates
+        them, with one serializer per level.
+
+        Every node is a dict with the `id` of the stored object (or
+        `None`), the `data` validated by the serializer, the index of its
+        `parent` in the previous level and its `path` in the document,
+        for the error messages.
+        """
+
+        self.nodes = []
+        parents = [{'node': self.document, 'path': None}]
+
+        for level, (children_key, _, serializer_class, _) in enumerate(
+            self.LEVELS
+        ):
+
+            nodes = []
+            seen_ids = set()
+
+            for parent_index, parent in enumerate(parents):
+
+                children = parent['node'].get(children_key, [])
+                path = (
+                    '{}.{}'.format(parent['path'], children_key)
+                    if parent['path'] else children_key
+                )
+
+                if not isinstance(children, list):
+                    self.fail(path, "Should be a list.")
+
+                if children_key == 'measures':
+                    self.check_measures(parent, children, path)
+                elif children_key == 'chords':
+                    self.check_chords(parent, children, path)
+
+                numbers = set()
+
+                for index, node in enumerate(children):
+
+                    node_path = '{}.{}'.format(path, index)
+
+                    if not isinstance(node, dict):
+                        self.fail(node_path, "Should be an object.")
+
+                    object_id = node.get('id')
+
+                    if object_id is not None:
+
+                        if (
+                            not isinstance(object_id, int) or
+                            object_id not in self.objects[level]
+                        ):
+                            self.fail(
+                                node_path,
+                                "No object with id {} in this chart.".format(
+                                    object_id
+                                )
+                            )
+
+                        if object_id in seen_ids:
+                            self.fail(
+                                node_path,
+                                "Id {} is used more than once.".format(
+                                    object_id
+                                )
+                            )
+
+                        seen_ids.add(object_id)
+
+                    if children_key == 'chords':
+
+                        if node.get('number') in numbers:
+                            self.fail(
+                                node_path,
+                                "Number {} is used more than once.".format(
+                                    node.get('number')
+                                )
+                            )
+
+                        numbers.add(node.get('number'))
+
+                    nodes.append({
+                        'node': node,
+                        'id': object_id,
+                        'parent': parent_index,
+                        'path': node_path
+                    })
+
+            serializer = serializer_class(
+                data=[node['node'] for node in nodes], many=True
+            )
+
+            if not serializer.is_valid():
+                for node, errors in zip(nodes, serializer.errors):
+                    if errors:
+                        self.fail(node['path'], errors)
+
+            for node, data in zip(nodes, serializer.validated_data):
+                node['data'] = data
+
+            self.nodes.append(nodes)
+            parents = nodes
+
+    def check_measures(self, line, measures, path):
+        """
+        Checks that the measures of `line` are numbered from 1 in order
+        and that the measures it repeats are there.
+
+        The view document leaves out the first measures of a line that
+        repeats another line, so its measures don't start at 1, or there
+        are fewer measures than `repeating_measures` says it repeats.
+        """
+
+        message = (
+            "Use the edit document, which has the repeated measures too."
+        )
+        repeating_measures = line['node'].get('repeating_measures')
+
+        if (
+            isinstance(repeating_measures, dict) and
+            isinstance(repeating_measures.get('measures'), list) and
+            len(measures) < len(repeating_measures['measures'])
+        ):
+            self.fail(path, (
+                "The line repeats {} measures, but {} are given. " + message
+            ).format(len(repeating_measures['measures']), len(measures)))
+
+        numbers = [
+            measure.get('number') if isinstance(measure, dict) else None
+            for measure in measures
+        ]
+
+        if numbers != list(range(1, len(measures) + 1)):
+            self.fail(path, (
+                "The measures should be numbered from 1 to {} in order. " +
+                message
+            ).format(len(measures)))
+
+    def check_chords(self, measure, chords, path):
+        """
+        Checks that `measure` has a chord for every beat group of its
+        beat schema. A measure without a beat schema in the document
+        keeps the stored one, or gets the default one if it is new.
+        """
+
+        beat_schema = measure['data'].get('beat_schema')
+
+        if beat_schema is None:
+            if measure['id'] is not None:
+                beat_schema = self.objects[2][measure['id']].beat_schema
+            else:
+                beat_schema = Measure._meta.get_field('beat_schema').default
+
+        chords_count = len(beat_schema.split('-'))
+
+        if len(chords) != chords_count:
+            self.fail(
+                path,
+                "The beat schema of the measure needs {} chords, but {} "
+                "are given.".format(chords_count, len(chords))
+            )
+
+    def read_chart(self):
+        """
+        Validates the fields of the chart itself and returns the
+        serializer to save them, or `None` if they didn't change.
+        """
+
+        serializer = ChartSerializer(
+            self.chart, data=self.document, partial=True
+        )
+
+        if not serializer.is_valid():
+            self.fail('', serializer.errors)
+
+        if any(
+            getattr(self.chart, name) != value
+            for name, value in serializer.validated_data.items()
+        ):
+            return serializer
+
+    def delete_chords(self):
+        """
+        Deletes the chords that aren't in the document anymore and the
+        chords that are replaced because they moved.
+
+        This happens first, so that the new chords don't collide with
+        the numbers of the old chords.
+        """
+
+        chords = self.objects[3]
+        measures = self.nodes[2]
+        kept_ids = set()
+
+        for node in self.nodes[3]:
+
+            if node['id'] is None:
+                continue
+
+            chord = chords[node['id']]
+
+            if (
+                measures[node['parent']]['id'] == chord.measure_id and
+                node['data'].get('number') == chord.number
+            ):
+                kept_ids.add(node['id'])
+            else:
+                node['id'] = None
+
+        deleted_ids = set(chords) - kept_ids
+
+        if deleted_ids:
+            Chord.objects.filter(id__in=deleted_ids).delete()
+            self.changed = self.structural = True
+
+    def save_level(self, level, nodes, parents):
+        """
+        Creates and updates the objects of `level` and returns the
+        instances, in the same order as `nodes`.
+        """
+
+        _, model, _, parent_field = self.LEVELS[level]
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+
+        instances = []
+        new_instances = []
+        updates = {}
+
+        for node in nodes:
+
+            parent_id = parents[node['parent']].id
+
+            if node['id'] is None:
+                instance = model(
+                    **{'chart_id': self.chart.id, parent_field: parent_id}
+                )
+                new_instances.append(instance)
+            else:
+                instance = self.objects[level][node['id']]
+
+            old_values = [
+                getattr(instance, field.attname) for field in fields
+            ]
+
+            setattr(instance, parent_field, parent_id)
+
+            for name, value in node['data'].items():
+                setattr(instance, name, value)
+
+            if node['id'] is not None:
+                for field, old_value in zip(fields, old_values):
+                    value = getattr(instance, field.attname)
+                    if value != old_value:
+                        updates.setdefault(field, {})[instance.id] = value
+
+            instances.append(instance)
+
+        if new_instances:
+
+            if model is Chord:
+                model.objects.bulk_create(new_instances)
+            else:
+                for instance in new_instances:
+                    instance.save()
+
+            self.changed = self.structural = True
+
+        for field, values in updates.items():
+            self.update_field(model, field, values)
+
+        if updates:
+            self.changed = True
+            self.structural = self.structural or model is not Chord
+
+        # Bulk creates and updates don't send signals, so record the
+        # changed measures for their packed chords and fingerprints.
+        if model is Chord:
+
+            measure_ids = {instance.measure_id for instance in new_instances}
+
+            for values in updates.values():
+                measure_ids.update(
+                    self.objects[level][chord_id].measure_id
+                    for chord_id in values
+                )
+
+            record_measure_change(measure_ids)
+
+        elif model is Measure:
+            for values in updates.values():
+                record_measure_change(values)
+
+        return instances
+
+    def update_field(self, model, field, values):
+        """
+        Sets `field` to the value in the dict `values` for every id in
+        it, with one UPDATE.
+        """
+
+        if isinstance(field, models.ForeignKey):
+            output_field = models.IntegerField()
+        else:
+            output_field = field.__class__()
+
+        model.objects.filter(id__in=values).update(**{
+            field.attname: models.Case(
+                *[
+                    models.When(id=object_id, then=models.Value(value))
+                    for object_id, value in values.items()
+                ],
+                output_field=output_field
+            )
+        })
+
+    def delete_objects(self):
+        """
+        Deletes the sections, lines and measures that aren't in the
+        document anymore.
+
+        This happens last, so that the objects that moved to another
+        parent aren't deleted together with their old parent.
+        """
+
+        for level, (_, model, _, _) in enumerate(self.LEVELS[:3]):
+
+            deleted_ids = set(self.objects[level]) - {
+                node['id'] for node in self.nodes[level]
+            }
+
+            if deleted_ids:
+                model.objects.filter(id__in=deleted_ids).delete()
+                self.changed = self.structural = True
+
+    def fail(self, path, errors):
+        raise ValidationError({'path': path, 'errors': errors})
@@ -0,0 +1,135 @@
+from ..models import Section, Line, Measure, Chord
+from ..reference_data import get_reference_data
+from .chart_tree import (
+    ChartTree, SectionNode, LineNode, MeasureNode, ChordNode, link_siblings
+)
+
+
+class ChartLoader():
+    """
+    Loads the complete tree of a chart in a fixed number of queries.
+
+    The sections, lines, measures and chords of the chart are fetched
+    with one query per table and put in a `ChartTree`, together with the
+    keys, notes, chord types and time signatures they refer to from the
+    reference data. After that, `client_data()` builds the same data as
+    `Chart.client_data()` without touching the database again, so the
+    amount of queries doesn't grow with the size of the chart.
+    """
+
+    def __init__(self, chart):
+        self.chart = chart
+        self.load()
+
+    def load(self):
+        """
+        Fetches all rows needed to render the chart and builds the
+        tree.
+        """
+
+        chart_id = self.chart.id
+        self.reference_data = reference_data = get_reference_data()
+        self.tree = tree = ChartTree(self.chart, reference_data)
+        sections = {}
+        lines = {}
+        measures = {}
+
+        section_rows = (
+            Section.objects.filter(chart_id=chart_id)
+            .values_list(
+                'id', 'number', 'name', 'key_id', 'time_signature_id',
+                'show_sidebar'
+            )
+        )
+
+        for row in section_rows:
+            section_id, number, name, key_id, time_signature_id, \
+                show_sidebar = row
+            section = SectionNode(
+                tree, section_id, number, name, reference_data.key(key_id),
+                reference_data.time_signature(time_signature_id),
+                show_sidebar
+            )
+            tree.sections.append(section)
+            sections[section_id] = section
+
+        line_rows = (
+            Line.objects.filter(chart_id=chart_id)
+            .values_list(
+                'section_id', 'id', 'number', 'letter',
+                '_merge_with_next_line'
+            )
+        )
+
+        for section_id, line_id, number, letter, merge in line_rows:
+            section = sections[section_id]
+            line = LineNode(section, line_id, number, letter, merge)
+            section.lines.append(line)
+            lines[line_id] = line
+
+        measure_rows = (
+            Measure.objects.filter(chart_id=chart_id)
+            .values_list('line_id', 'id', 'number', 'beat_schema')
+        )
+
+        for line_id, measure_id, number, beat_schema in measure_rows:
+            line = lines[line_id]
+            measure = MeasureNode(line, measure_id, number, beat_schema)
+            line.measures.append(measure)
+            measures[measure_id] = measure
+
+        chord_rows = (
+            Chord.objects.filter(chart_id=chart_id)
+            .values_list(
+                'measure_id', 'id', 'number', 'beats', 'chord_pitch',
+                '_chord_note_alt_notation', 'chord_type_id', 'alt_bass',
+                'alt_bass_pitch', '_alt_bass_note_alt_notation', 'rest'
+            )
+        )
+
+        for row in chord_rows:
+            measure = measures[row[0]]
+            chord = ChordNode(
+                measure, row[1], row[2], row[3], row[4], row[5],
+                reference_data.chord_type(row[6]), row[7], row[8], row[9],
+                row[10]
+            )
+            measure.chords.append(chord)
+
+        link_siblings(tree.sections, 'prev_section', 'next_section')
+
+        for section in tree.sections:
+
+            link_siblings(section.lines, 'prev_line', 'next_line')
+
+            for line in section.lines:
+                link_siblings(line.measures, 'prev_measure', 'next_measure')
+
+        if tree.sections:
+            tree.key = tree.sections[0].key
+
+    def transpose(self, tonic):
+        """
+        Transposes the tree in place to the given `tonic`.
+        """
+
+        tree = self.tree
+        reference_data = self.reference_data
+        interval = reference_data.transpose_interval(tree.key.id, tonic)
+
+        tree.key = reference_data.key_by_tonic(tonic, tree.key.tonality)
+
+        for section in tree.sections:
+            section.key = reference_data.transposed_key(
+                section.key.id, interval
+            )
+
+    def client_data(self, edit=False, transpose_to_tonic=None):
+        """
+        Returns the same data as `Chart.client_data()`.
+        """
+
+        if transpose_to_tonic:
+            self.transpose(transpose_to_tonic)
+
+        return self.tree.client_data(edit=edit)
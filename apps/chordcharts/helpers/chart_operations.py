@@ -0,0 +1,218 @@
+from collections import defaultdict
+
+from rest_framework.exceptions import ValidationError
+
+from ..models import Section, Line, Measure, Chord
+from ..serializers import (
+    SectionSerializer, LineSerializer, MeasureSerializer, ChordSerializer
+)
+from ..revisions import revision_batch
+
+
+class ChartOperations():
+    """
+    Applies a list of operations on the sections, lines, measures and
+    chords of a chart in one transaction.
+
+    Every operation is a dict with these keys:
+
+    action  - "create", "update" or "delete".
+    model   - "section", "line", "measure" or "chord".
+    id      - The id of the object to update or delete.
+    parent  - The id of the parent of the object to create. Not needed
+              for sections, they're created in the chart.
+    ref     - Optional name for the object to create, so that later
+              operations can refer to it with "$<ref>" as `id` or
+              `parent`.
+    data    - The fields of the object, like in the REST API.
+
+    All objects referred to by id are loaded with one query per model,
+    which also makes sure they belong to the chart. So the permissions
+    only have to be checked for the chart itself.
+
+    Deleting an object that was already deleted together with its parent
+    by an earlier operation is fine, so that a client can send its
+    deletes in any order.
+
+    Raises a `ValidationError` if an operation is invalid, in which case
+    none of the operations are applied.
+    """
+
+    # For every model: the model, its serializer, the parent model and
+    # the serializer context key for the parent id.
+    MODELS = {
+        'section': (Section, SectionSerializer, None, 'chart_id'),
+        'line': (Line, LineSerializer, 'section', 'section_id'),
+        'measure': (Measure, MeasureSerializer, 'line', 'line_id'),
+        'chord': (Chord, ChordSerializer, 'measure', 'measure_id')
+    }
+
+    ACTIONS = ('create', 'update', 'delete')
+
+    def __init__(self, chart, operations):
+        self.chart = chart
+        self.operations = operations
+        self.objects = defaultdict(dict)
+        self.ids = {}
+        self.results = []
+        self.deleted = set()
+
+    def apply(self):
+        """
+        Applies all operations and refreshes the revision of the chart.
+        """
+
+        with revision_batch():
+
+            self.validate_operations()
+            self.load_objects()
+
+            for index, operation in enumerate(self.operations):
+                self.results.append(self.apply_operation(index, operation))
+
+        self.chart.refresh_from_db(fields=['revision'])
+
+    def validate_operations(self):
+
+        for index, operation in enumerate(self.operations):
+
+            if not isinstance(operation, dict):
+                self.fail(index, "Operation should be an object.")
+
+            if operation.get('action') not in self.ACTIONS:
+                self.fail(index, "Invalid action.")
+
+            if operation.get('model') not in self.MODELS:
+                self.fail(index, "Invalid model.")
+
+            if not isinstance(operation.get('data', {}), dict):
+                self.fail(index, "Data should be an object.")
+
+    def load_objects(self):
+        """
+        Loads all existing objects the operations refer to, with one
+        query per model.
+        """
+
+        ids = defaultdict(set)
+
+        for operation in self.operations:
+
+            model_name = operation['model']
+
+            if operation['action'] == 'create':
+                model_name = self.MODELS[model_name][2]
+                object_id = operation.get('parent')
+            else:
+                object_id = operation.get('id')
+
+            if model_name and isinstance(object_id, int):
+                ids[model_name].add(object_id)
+
+        for model_name, model_ids in ids.items():
+            model = self.MODELS[model_name][0]
+            self.objects[model_name] = model.objects.filter(
+                chart_id=self.chart.id, id__in=model_ids
+            ).in_bulk(model_ids)
+
+    def apply_operation(self, index, operation):
+
+        model_name = operation['model']
+        action = operation['action']
+        data = operation.get('data', {})
+        _, serializer_class, parent_name, context_key = (
+            self.MODELS[model_name]
+        )
+
+        if action == 'create':
+
+            if parent_name:
+                parent_id = self.get_object(
+                    index, parent_name, operation.get('parent')
+                ).id
+            else:
+                parent_id = self.chart.id
+
+            serializer = serializer_class(
+                data=data,
+                context={context_key: parent_id, 'chart_id': self.chart.id}
+            )
+
+        else:
+
+            if (
+                action == 'delete' and
+                (model_name, self.resolve_id(operation.get('id'))) in
+                self.deleted
+            ):
+                return {'id': operation.get('id')}
+
+            instance = self.get_object(
+                index, model_name, operation.get('id')
+            )
+
+            if action == 'delete':
+                self.forget(model_name, instance.id)
+                instance.delete()
+                return {'id': operation.get('id')}
+
+            serializer = serializer_class(instance, data=data, partial=True)
+
+        if not serializer.is_valid():
+            self.fail(index, serializer.errors)
+
+        instance = serializer.save()
+        self.objects[model_name][instance.id] = instance
+
+        if action == 'create' and operation.get('ref'):
+            self.ids[operation['ref']] = instance.id
+
+        return serializer.data
+
+    def get_object(self, index, model_name, object_id):
+        """
+        Returns the loaded or created object of `model_name` with the
+        given `object_id`, which can also be a "$<ref>".
+        """
+
+        object_id = self.resolve_id(object_id)
+
+        try:
+            return self.objects[model_name][object_id]
+        except KeyError:
+            self.fail(
+                index, "No {} with id {} in this chart.".format(
+                    model_name, object_id
+                )
+            )
+
+    def resolve_id(self, object_id):
+        """
+        Returns the id of the object created with the ref if `object_id`
+        is a "$<ref>", otherwise `object_id` itself.
+        """
+
+        if isinstance(object_id, str) and object_id.startswith('$'):
+            return self.ids.get(object_id[1:])
+
+        return object_id
+
+    def forget(self, model_name, object_id):
+        """
+        Forgets the object of `model_name` with `object_id` and the
+        loaded objects inside it, because they're deleted with it.
+        """
+
+        self.objects[model_name].pop(object_id, None)
+        self.deleted.add((model_name, object_id))
+
+        for child_name, (_, _, parent_name, context_key) in (
+            self.MODELS.items()
+        ):
+            if parent_name == model_name:
+                for child in list(self.objects[child_name].values()):
+                    if getattr(child, context_key) == object_id:
+                        self.forget(child_name, child.id)
+
+    def fail(self, index, errors):
+        raise ValidationError({'operation': index, 'errors': errors})
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+# The number of charts on a page of search results.
+PAGE_SIZE = 50
+
+
+def chart_page(charts, cursor=None, page_size=PAGE_SIZE):
+    """
+    Returns a `(page, next_cursor)` tuple with a list of the first
+    `page_size` charts of the queryset `charts` after `cursor`, ordered
+    by song name and id.
+
+    The cursor holds the song name and id of the last chart of the
+    previous page, so every page is one query with a `LIMIT`, no matter
+    how far it is in the results. `next_cursor` is `None` on the last
+    page. Invalid cursors give the first page.
+
+    The queryset can also be a `values_list()`, if its first two values
+    are the song name and the id of the chart.
+    """
+
+    charts = charts.order_by('song__name', 'id')
+    after = decode_cursor(cursor)
+
+    if after:
+        song_name, chart_id = after
+        charts = charts.filter(
+            Q(song__name__gt=song_name) |
+            Q(song__name=song_name, id__gt=chart_id)
+        )
+
+    page = list(charts[:page_size + 1])
+
+    if len(page) <= page_size:
+        return page, None
+
+    page = page[:page_size]
+    last = page[-1]
+
+    if isinstance(last, tuple):
+        song_name, chart_id = last[:2]
+    else:
+        song_name, chart_id = last.song.name, last.id
+
+    return page, encode_cursor(song_name, chart_id)
+
+
+def encode_cursor(song_name, chart_id):
+    return base64.urlsafe_b64encode(
+        json.dumps([song_name, chart_id]).encode()
+    ).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Returns the `(song_name, chart_id)` in `cursor`, or `None` if it's
+    empty or invalid.
+    """
+
+    if not cursor:
+        return None
+
+    try:
+        song_name, chart_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode()).decode()
+        )
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        return None
+
+    if not isinstance(song_name, str) or not isinstance(chart_id, int):
+        return None
+
+    return song_name, chart_id
@@ -0,0 +1,453 @@
+from core.helpers.number_to_ordinal import number_to_ordinal
+from ..settings import BOXED_CHART
+from .section_analysis import SectionAnalysis
+
+
+class ChartTree():
+    """
+    A lightweight, read-only representation of a chart.
+
+    The tree mirrors the chart's sections, lines, measures and chords,
+    but unlike the models every node holds direct links to its parent
+    and its siblings, so walking the tree never touches the database.
+    It's built once by `ChartLoader` and is meant for rendering only.
+    """
+
+    __slots__ = ('chart', 'key', 'reference_data', 'sections')
+
+    def __init__(self, chart, reference_data):
+        self.chart = chart
+        self.reference_data = reference_data
+        self.key = None
+        self.sections = []
+
+    def client_data(self, edit=False):
+        chart = self.chart
+        return {
+            'id': chart.id,
+            'owner': chart.owner.client_data(),
+            'song': chart.song.client_data(),
+            'public': chart.public,
+            'short_description': chart.short_description,
+            'lyrics_url': chart.lyrics_url,
+            'video_url': chart.video_url,
+            'key': self.key_client_data(self.key),
+            'sections': [s.client_data(edit=edit) for s in self.sections]
+        }
+
+    def key_client_data(self, key):
+        """
+        Returns the same data as `Key.client_data()`, using the
+        reference data.
+        """
+        return {
+            'id': key.id,
+            'name': key.name,
+            'slug': key.slug,
+            'tonic': key.tonic,
+            'tonality': key.tonality,
+            'distance_from_c': key.distance_from_c,
+            'notes': [
+                note.client_data()
+                for note in self.reference_data.notes(key.id)
+            ]
+        }
+
+    def note(self, key, distance_from_root):
+        """
+        Get the note of `key` at `distance_from_root`.
+        """
+        return self.reference_data.note(key.id, distance_from_root)
+
+
+class SectionNode():
+
+    __slots__ = (
+        'id', 'number', 'name', '_key', 'time_signature', 'show_sidebar',
+        'chart', 'prev_section', 'next_section', 'lines', '_analysis'
+    )
+
+    def __init__(
+        self, chart, id, number, name, key, time_signature, show_sidebar
+    ):
+        self.chart = chart
+        self.id = id
+        self.number = number
+        self.name = name
+        self.key = key
+        self.time_signature = time_signature
+        self.show_sidebar = show_sidebar
+        self.prev_section = None
+        self.next_section = None
+        self.lines = []
+
+    def client_data(self, edit=False):
+        return {
+            'id': self.id,
+            'key': self.chart.key_client_data(self.key),
+            'number': self.number,
+            'name': self.name,
+            'show_key': self.show_key,
+            'can_move_down': self.next_section is not None,
+            'can_move_up': self.prev_section is not None,
+            'can_delete': len(self.chart.sections) > 1,
+            'time_signature': self.time_signature.id,
+            'show_sidebar': self.show_sidebar,
+            'height': self.height,
+            'key_id': self.key.id,
+            'lines': [l.client_data(edit=edit) for l in self.lines]
+        }
+
+    @property
+    def key(self):
+        return self._key
+
+    @key.setter
+    def key(self, key):
+        # The notation of the chords depends on the key, so the
+        # analysis has to be redone.
+        self._key = key
+        self._analysis = None
+
+    @property
+    def analysis(self):
+        """
+        The `SectionAnalysis` of this section, which holds the
+        subsections and repeating measures of all lines.
+        """
+
+        if self._analysis is None:
+            self._analysis = SectionAnalysis(self)
+
+        return self._analysis
+
+    @property
+    def height(self):
+        return ((
+            len(self.lines) *
+            (BOXED_CHART['box_height'] + BOXED_CHART['border_width'])
+        ) + BOXED_CHART['border_width'])
+
+    @property
+    def show_key(self):
+        """
+        Returns a boolean indicating whether to show the key of this
+        section.
+        """
+
+        if not self.prev_section:
+            return False
+
+        return self.key != self.prev_section.key
+
+
+class LineNode():
+
+    __slots__ = (
+        'id', 'number', 'letter', '_merge_with_next_line', 'section',
+        'prev_line', 'next_line', 'measures'
+    )
+
+    def __init__(self, section, id, number, letter, merge_with_next_line):
+        self.section = section
+        self.id = id
+        self.number = number
+        self.letter = letter
+        self._merge_with_next_line = merge_with_next_line
+        self.prev_line = None
+        self.next_line = None
+        self.measures = []
+
+    @property
+    def merge_with_next_line(self):
+        return bool(
+            self._merge_with_next_line
+            and self.section.show_sidebar
+            and self.next_line
+            and self.next_line.letter == self.letter
+        )
+
+    @property
+    def merge_with_prev_line(self):
+        return bool(self.prev_line and self.prev_line.merge_with_next_line)
+
+    @property
+    def key(self):
+        return self.section.key
+
+    @property
+    def time_signature(self):
+        return self.section.time_signature
+
+    @property
+    def subsection_number(self):
+        """
+        Returns the number of the subsection this line is in, or `False`
+        if the section doesn't have the sidebar enabled.
+        """
+        return self.section.analysis.subsection_number[self]
+
+    @property
+    def subsection_line_number(self):
+        """
+        Returns the line number inside the subsection, or `False` if the
+        section doesn't have the sidebar enabled.
+        """
+        return self.section.analysis.subsection_line_number[self]
+
+    def client_data(self, edit=False):
+
+        measures = [m.client_data() for m in self.measures]
+        repeating_measures = self.repeating_measures_client_data()
+
+        total_measures = len(measures)
+
+        if repeating_measures:
+            total_measures += len(repeating_measures['measures'])
+
+        if not edit and repeating_measures:
+            measures = measures[len(repeating_measures['measures']):]
+
+        return {
+            'id': self.id,
+            'number': self.number,
+            'letter': self.letter,
+            'merge_with_next_line': self.merge_with_next_line,
+            'repeating_measures': repeating_measures,
+            'measures': measures,
+            'total_measures': total_measures
+        }
+
+    def repeating_measures_client_data(self):
+
+        repeating_measures = self.repeating_measures()
+
+        if repeating_measures:
+
+            client_data = {
+                'measures': list(range(repeating_measures['amount'])),
+                'line_letter': repeating_measures['line'].letter,
+                'subsection_number': number_to_ordinal(
+                    repeating_measures['line'].subsection_number
+                ),
+                'span_next_line': repeating_measures['span_next_line'],
+                'span_prev_line': repeating_measures['span_prev_line']
+            }
+
+        else:
+            client_data = None
+
+        return client_data
+
+    def repeating_measures(self, context_info=True):
+        """
+        Returns information about repeating measures if there are any.
+
+        See `Line.repeating_measures()` for the format of the result.
+        """
+        return self.section.analysis.repeating_measures(
+            self, context_info=context_info
+        )
+
+
+class MeasureNode():
+
+    __slots__ = (
+        'id', 'number', 'beat_schema', 'line', 'prev_measure',
+        'next_measure', 'chords'
+    )
+
+    def __init__(self, line, id, number, beat_schema):
+        self.line = line
+        self.id = id
+        self.number = number
+        self.beat_schema = beat_schema
+        self.prev_measure = None
+        self.next_measure = None
+        self.chords = []
+
+    def client_data(self):
+        chords_count = self.chords_count
+        return {
+            'id': self.id,
+            'number': self.number,
+            'beat_schema': self.beat_schema,
+            'chords': [
+                c.client_data() for c in self.chords
+                if c.number <= chords_count
+            ]
+        }
+
+    @property
+    def key(self):
+        return self.line.section.key
+
+    @property
+    def time_signature(self):
+        return self.line.section.time_signature
+
+    @property
+    def chords_count(self):
+        return len(self.beat_schema.split('-'))
+
+    def equal_to(self, measure):
+        """
+        Returns a boolean indicating if the given `measure` is equal to
+        this measure.
+        """
+        return measure.beat_schema == self.beat_schema and all(
+            chord1.equal_to(chord2)
+            for chord1, chord2 in zip(measure.chords, self.chords)
+        )
+
+    def repeating_prev_measure(self):
+        """
+        Returns a boolean indicating if this measure should show a
+        repetition sign to repeat the previous measure.
+        """
+
+        prev_measure = self.prev_measure
+
+        if not (prev_measure and self.chords and prev_measure.chords):
+            return False
+
+        beats = self.time_signature.beats
+        chord = self.chords[0]
+        prev_measure_chord = prev_measure.chords[0]
+
+        return (
+            chord.beats == beats and
+            prev_measure_chord.beats == beats and
+            chord.equal_to(prev_measure_chord)
+        )
+
+
+class ChordNode():
+
+    __slots__ = (
+        'id', 'number', 'beats', 'chord_pitch', '_chord_note_alt_notation',
+        'chord_type', 'alt_bass', 'alt_bass_pitch',
+        '_alt_bass_note_alt_notation', 'rest', 'measure'
+    )
+
+    def __init__(
+        self, measure, id, number, beats, chord_pitch,
+        chord_note_alt_notation, chord_type, alt_bass, alt_bass_pitch,
+        alt_bass_note_alt_notation, rest
+    ):
+        self.measure = measure
+        self.id = id
+        self.number = number
+        self.beats = beats
+        self.chord_pitch = chord_pitch
+        self._chord_note_alt_notation = chord_note_alt_notation
+        self.chord_type = chord_type
+        self.alt_bass = alt_bass
+        self.alt_bass_pitch = alt_bass_pitch
+        self._alt_bass_note_alt_notation = alt_bass_note_alt_notation
+        self.rest = rest
+
+    def client_data(self):
+        return {
+            'id': self.id,
+            'beats': self.beats,
+            'chord_pitch': self.chord_pitch,
+            'chord_note_alt_notation': self.chord_note_alt_notation,
+            'alt_bass': self.alt_bass,
+            'alt_bass_pitch': self.alt_bass_pitch,
+            'alt_bass_note_alt_notation': self.alt_bass_note_alt_notation,
+            'rest': self.rest,
+            'number': self.number,
+            'chord_type_id': self.chord_type.id,
+            'chart_output': self.chart_output,
+            'chart_fontsize': self.chart_fontsize
+        }
+
+    @property
+    def section(self):
+        return self.measure.line.section
+
+    @property
+    def key(self):
+        return self.section.key
+
+    @property
+    def note(self):
+        section = self.section
+        return section.chart.note(section.key, self.chord_pitch)
+
+    @property
+    def alt_bass_note(self):
+        if self.alt_bass:
+            section = self.section
+            return section.chart.note(section.key, self.alt_bass_pitch)
+        else:
+            return None
+
+    @property
+    def chord_note_alt_notation(self):
+        section = self.section
+        return bool(
+            self._chord_note_alt_notation and
+            section.chart.reference_data.has_alt_name(
+                section.key.id, self.chord_pitch
+            )
+        )
+
+    @property
+    def alt_bass_note_alt_notation(self):
+        section = self.section
+        return bool(
+            self._alt_bass_note_alt_notation and
+            self.alt_bass and
+            section.chart.reference_data.has_alt_name(
+                section.key.id, self.alt_bass_pitch
+            )
+        )
+
+    @property
+    def chord_notation(self):
+        """
+        The notation for the chord, see `Chord.chord_notation`.
+        """
+        section = self.section
+        return section.chart.reference_data.chord_symbol(
+            section.key.id,
+            self.chord_pitch,
+            self._chord_note_alt_notation,
+            self.chord_type.id,
+            self.alt_bass_pitch if self.alt_bass else None,
+            self._alt_bass_note_alt_notation
+        )
+
+    @property
+    def chart_output(self):
+        if self.rest:
+            return 'REST'
+        elif self.measure.repeating_prev_measure():
+            return '%'
+        else:
+            return self.chord_notation
+
+    @property
+    def chart_fontsize(self):
+        if self.rest:
+            return 'tiny'
+        else:
+            return 'normal'
+
+    def equal_to(self, chord):
+        return bool(
+            (self.rest and chord.rest)
+            or self.chord_notation == chord.chord_notation
+        )
+
+
+def link_siblings(nodes, prev_attr, next_attr):
+    """
+    Links each of the given `nodes` to its previous and next node
+    through the attributes `prev_attr` and `next_attr`.
+    """
+    for prev_node, next_node in zip(nodes, nodes[1:]):
+        setattr(prev_node, next_attr, next_node)
+        setattr(next_node, prev_attr, prev_node)
@@ -0,0 +1,81 @@
+from urllib.parse import quote
+
+from django.db.models import Count
+
+from ..models import Chart
+
+
+def get_chart_version(request, chart_id):
+    """
+    Returns a `(revision, modification_date, song_modification_date,
+    song_chart_count)` tuple for the chart with id `chart_id`, or `None`
+    if there's no such chart.
+
+    The result is kept on the request, so the ETag and the Last-Modified
+    of a response cost a single query together.
+    """
+
+    versions = getattr(request, '_chart_versions', None)
+
+    if versions is None:
+        versions = request._chart_versions = {}
+
+    if chart_id not in versions:
+        versions[chart_id] = (
+            Chart.objects.filter(id=chart_id)
+            .annotate(song_chart_count=Count('song__charts'))
+            .values_list(
+                'revision', 'modification_date', 'song__modification_date',
+                'song_chart_count'
+            )
+            .first()
+        )
+
+    return versions[chart_id]
+
+
+def chart_etag(request, chart_id, *variant, with_song=False):
+    """
+    Returns the ETag for a response about the chart with id `chart_id`,
+    or `None` if there's no such chart.
+
+    The ETag consists of the chart's revision, the current user, because
+    responses differ per user, and the given `variant`, which should hold
+    everything else the response depends on, like the key or mode.
+
+    If `with_song` is `True`, the ETag also changes when the song of the
+    chart is saved or gets another chart, or one of its charts is
+    deleted, for responses that show the song or its other charts.
+    """
+
+    version = get_chart_version(request, chart_id)
+
+    if version is None:
+        return None
+
+    parts = (chart_id, version[0], request.user.pk or 0) + variant
+
+    if with_song:
+        parts += (version[2].timestamp(), version[3])
+
+    return '-'.join(quote(str(part)) for part in parts)
+
+
+def chart_last_modified(request, chart_id, with_song=False):
+    """
+    Returns the modification date of the chart with id `chart_id`, or
+    `None` if there's no such chart.
+
+    If `with_song` is `True`, this is the modification date of the song
+    if the song was saved later.
+    """
+
+    version = get_chart_version(request, chart_id)
+
+    if version is None:
+        return None
+
+    if with_song:
+        return max(version[1], version[2])
+
+    return version[1]
@@ -0,0 +1,91 @@
+import json
+
+from django.db import transaction, IntegrityError
+
+from ..models import MaterializedChart
+from .chart_loader import ChartLoader
+
+
+def get_materialized_chart(chart, edit):
+    """
+    Returns a `(chart_data, chart_json)` tuple for the given `chart` in
+    its own key, in edit mode if `edit` is `True`.
+
+    The JSON comes from the `MaterializedChart` of the chart, which can
+    be fetched together with the chart with
+    `select_related('materialized')`. If the chart doesn't have one yet,
+    or it's built from an older revision, it's built first.
+    """
+
+    try:
+        materialized = chart.materialized
+    except MaterializedChart.DoesNotExist:
+        materialized = None
+
+    if materialized is None or materialized.revision != chart.revision:
+        materialized, _ = materialize_chart(chart)
+
+    if edit:
+        chart_json = materialized.edit_document
+    else:
+        chart_json = materialized.document
+
+    return json.loads(chart_json), chart_json
+
+
+def materialize_chart(chart, force=False):
+    """
+    Builds the documents of the `MaterializedChart` of `chart` from its
+    current revision and saves them. Returns a
+    `(materialized_chart, written)` tuple, where `written` tells whether
+    the documents were saved.
+
+    The revision is taken from `chart` before the rows are loaded, so if
+    the chart changes in the meantime, the documents are built again on
+    the next read. Documents that are already built from the same or a
+    newer revision are kept, unless `force` is `True`, which is for
+    rebuilding documents after a change to how charts are rendered.
+    """
+
+    revision = chart.revision
+
+    with transaction.atomic():
+
+        loader = ChartLoader(chart)
+        materialized = MaterializedChart(
+            chart=chart,
+            revision=revision,
+            document=json.dumps(loader.client_data()),
+            edit_document=json.dumps(loader.client_data(edit=True))
+        )
+        values = {
+            'revision': revision,
+            'document': materialized.document,
+            'edit_document': materialized.edit_document
+        }
+
+        if force:
+            materialized, _ = MaterializedChart.objects.update_or_create(
+                chart_id=chart.id, defaults=values
+            )
+            written = True
+        else:
+            written = bool(
+                MaterializedChart.objects.filter(
+                    chart_id=chart.id, revision__lt=revision
+                ).update(**values)
+            )
+
+            if not written:
+                try:
+                    with transaction.atomic():
+                        materialized.save(force_insert=True)
+                    written = True
+                except IntegrityError:
+                    # There already is one, from this or a newer
+                    # revision.
+                    pass
+
+    chart.materialized = materialized
+
+    return materialized, written
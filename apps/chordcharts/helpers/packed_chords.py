@@ -0,0 +1,230 @@
+import hashlib
+import struct
+from collections import defaultdict, namedtuple
+
+from django.apps import apps
+from django.db import models
+
+
+# Every chord is packed in the same amount of bytes: the chord pitch,
+# the alt bass pitch, the chord type id, the beats and the flags.
+CHORD_STRUCT = struct.Struct('>HHIHB')
+
+REST = 1
+ALT_BASS = 2
+CHORD_NOTE_ALT_NOTATION = 4
+ALT_BASS_NOTE_ALT_NOTATION = 8
+
+# The fields of `Chord` that are packed, in the order `pack_chord()`
+# expects them.
+PACKED_FIELDS = (
+    'chord_pitch', 'alt_bass_pitch', 'chord_type_id', 'beats', 'rest',
+    'alt_bass', '_chord_note_alt_notation', '_alt_bass_note_alt_notation'
+)
+
+# A chord unpacked from the bytes. The alt notation flags are the
+# stored values, like `Chord._chord_note_alt_notation`.
+PackedChord = namedtuple('PackedChord', (
+    'chord_pitch', 'alt_bass_pitch', 'chord_type_id', 'beats', 'rest',
+    'alt_bass', 'chord_note_alt_notation', 'alt_bass_note_alt_notation'
+))
+
+
+def pack_chord(
+    chord_pitch, alt_bass_pitch, chord_type_id, beats, rest, alt_bass,
+    chord_note_alt_notation, alt_bass_note_alt_notation
+):
+    """
+    Returns the bytes for a chord with the given values, in the order of
+    `PACKED_FIELDS`.
+    """
+
+    flags = (
+        (REST if rest else 0) |
+        (ALT_BASS if alt_bass else 0) |
+        (CHORD_NOTE_ALT_NOTATION if chord_note_alt_notation else 0) |
+        (ALT_BASS_NOTE_ALT_NOTATION if alt_bass_note_alt_notation else 0)
+    )
+
+    return CHORD_STRUCT.pack(
+        chord_pitch, alt_bass_pitch, chord_type_id, beats, flags
+    )
+
+
+def pack_chords(rows):
+    """
+    Returns the packed chords of a measure for the given rows, which
+    should be in the order of the chords and have the values of
+    `PACKED_FIELDS`.
+    """
+    return b''.join(pack_chord(*row) for row in rows)
+
+
+def unpack_chords(packed):
+    """
+    Returns a list with a `PackedChord` for every chord in the bytes
+    `packed`.
+    """
+
+    chords = []
+
+    for offset in range(0, len(packed), CHORD_STRUCT.size):
+
+        chord_pitch, alt_bass_pitch, chord_type_id, beats, flags = (
+            CHORD_STRUCT.unpack_from(packed, offset)
+        )
+
+        chords.append(PackedChord(
+            chord_pitch, alt_bass_pitch, chord_type_id, beats,
+            bool(flags & REST), bool(flags & ALT_BASS),
+            bool(flags & CHORD_NOTE_ALT_NOTATION),
+            bool(flags & ALT_BASS_NOTE_ALT_NOTATION)
+        ))
+
+    return chords
+
+
+def measure_fingerprint(beat_schema, packed):
+    """
+    Returns the fingerprint of a measure with the given `beat_schema`
+    and `packed` chords, as a signed 64 bit integer.
+
+    The fingerprint is made from the chords relative to the key, with
+    only the values that count in `chords_equal()`: all rests are the
+    same and the beats of the chords don't matter. So measures in the
+    same key with the same fingerprint are equal.
+    """
+
+    content = [beat_schema.encode(), b'\0']
+
+    for chord in unpack_chords(packed):
+
+        if chord.rest:
+            content.append(pack_chord(0, 0, 0, 0, True, False, False, False))
+        else:
+            content.append(pack_chord(
+                chord.chord_pitch,
+                chord.alt_bass_pitch if chord.alt_bass else 0,
+                chord.chord_type_id,
+                0,
+                False,
+                chord.alt_bass,
+                chord.chord_note_alt_notation,
+                chord.alt_bass and chord.alt_bass_note_alt_notation
+            ))
+
+    digest = hashlib.sha1(b''.join(content)).digest()
+
+    return struct.unpack('>q', digest[:8])[0]
+
+
+def chord_notation(reference_data, key_id, chord):
+    """
+    Returns the notation of the `PackedChord` in the key with id
+    `key_id`, like `Chord.chord_notation`.
+    """
+    return reference_data.chord_symbol(
+        key_id,
+        chord.chord_pitch,
+        chord.chord_note_alt_notation,
+        chord.chord_type_id,
+        chord.alt_bass_pitch if chord.alt_bass else None,
+        chord.alt_bass_note_alt_notation
+    )
+
+
+def chords_equal(reference_data, key_id1, chord1, key_id2, chord2):
+    """
+    Compares two `PackedChord`s like `Chord.equal_to()` does.
+
+    Chords with the same values in the same key are equal without
+    looking up their notation.
+    """
+    return bool(
+        (chord1.rest and chord2.rest) or
+        (key_id1 == key_id2 and chord1 == chord2) or
+        chord_notation(reference_data, key_id1, chord1) ==
+        chord_notation(reference_data, key_id2, chord2)
+    )
+
+
+def packed_chords_equal(reference_data, key_id1, packed1, key_id2, packed2):
+    """
+    Compares the packed chords of two measures like `Measure.equal_to()`
+    does, for measures with the same beat schema.
+
+    Measures with the same bytes in the same key are equal without
+    unpacking them.
+    """
+
+    if key_id1 == key_id2 and packed1 == packed2:
+        return True
+
+    return all(
+        chords_equal(reference_data, key_id1, chord1, key_id2, chord2)
+        for chord1, chord2 in zip(
+            unpack_chords(packed1), unpack_chords(packed2)
+        )
+    )
+
+
+def repack_measures(measure_ids):
+    """
+    Packs the chords of the measures with the given ids again and stores
+    them on the measures together with their fingerprints, with one query
+    for the measures, one for the chords and one UPDATE.
+
+    Ids of measures that don't exist anymore are ignored.
+    """
+
+    if not measure_ids:
+        return
+
+    Measure = apps.get_model('chordcharts', 'Measure')
+    Chord = apps.get_model('chordcharts', 'Chord')
+
+    # The ids can come from URL arguments, so they can be strings, the
+    # ids from the database are used from here on.
+    beat_schemas = dict(
+        Measure.objects.filter(id__in=measure_ids)
+        .values_list('id', 'beat_schema')
+    )
+
+    if not beat_schemas:
+        return
+
+    rows = defaultdict(list)
+
+    for row in (
+        Chord.objects.filter(measure_id__in=beat_schemas)
+        .order_by('number')
+        .values_list('measure_id', *PACKED_FIELDS)
+    ):
+        rows[row[0]].append(row[1:])
+
+    packed = {
+        measure_id: pack_chords(rows[measure_id])
+        for measure_id in beat_schemas
+    }
+
+    Measure.objects.filter(id__in=beat_schemas).update(
+        packed_chords=models.Case(
+            *[
+                models.When(id=measure_id, then=models.Value(value))
+                for measure_id, value in packed.items()
+            ],
+            output_field=models.BinaryField()
+        ),
+        fingerprint=models.Case(
+            *[
+                models.When(
+                    id=measure_id,
+                    then=models.Value(
+                        measure_fingerprint(beat_schema, packed[measure_id])
+                    )
+                )
+                for measure_id, beat_schema in beat_schemas.items()
+            ],
+            output_field=models.BigIntegerField()
+        )
+    )
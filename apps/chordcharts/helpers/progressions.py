@@ -0,0 +1,207 @@
+from itertools import groupby
+
+from django.apps import apps
+from django.db import models
+
+
+# The number of chords in an indexed progression. Searches need at
+# least this many chords.
+GRAM_SIZE = 3
+
+# The number of bits for a chord in a gram. A chord is its chord type
+# id times 12 plus its pitch, so chord type ids have to stay below
+# 2 ** 20 / 12. Three chords fit in a signed 64 bit integer.
+CHORD_BITS = 20
+
+
+def chord_token(chord_pitch, chord_type_id):
+    """
+    Returns the number for a chord in a progression. The pitch is
+    relative to the key of the section, so the same progression in
+    another key gives the same numbers.
+    """
+    return chord_type_id * 12 + chord_pitch % 12
+
+
+def progression_tokens(chords):
+    """
+    Returns the tokens of the given `(chord_pitch, chord_type_id)`
+    chords, in which a chord that's repeated right after itself is only
+    counted once, so that the rhythm doesn't matter.
+    """
+
+    tokens = []
+
+    for chord_pitch, chord_type_id in chords:
+        token = chord_token(chord_pitch, chord_type_id)
+        if not tokens or tokens[-1] != token:
+            tokens.append(token)
+
+    return tokens
+
+
+def progression_gram(tokens):
+    """
+    Returns the gram for `GRAM_SIZE` tokens. The tokens are put next to
+    each other in the bits of the number, so different progressions
+    never get the same gram.
+    """
+
+    gram = 0
+
+    for token in tokens:
+        gram = (gram << CHORD_BITS) | token
+
+    return gram
+
+
+def progression_grams(rows):
+    """
+    Generates the grams of the chords in `rows` as
+    `(chord_id, gram, next_chord_id, chart_id, section_id, measure_id)`
+    tuples, where `chord_id` and `measure_id` are of the first chord of
+    the gram and `next_chord_id` is the first chord of the next gram.
+
+    The rows should have the values `chart_id`, `section_id`,
+    `measure_id`, `id`, `chord_pitch`, `chord_type_id` and `rest`, in the
+    order of the chords in every section. Rests are skipped and repeated
+    chords are counted once, like in `progression_tokens()`.
+    """
+
+    for section_id, section_rows in groupby(rows, key=lambda row: row[1]):
+
+        tokens = []
+        chords = []
+
+        for (
+            chart_id, _, measure_id, chord_id, chord_pitch, chord_type_id,
+            rest
+        ) in section_rows:
+
+            if rest:
+                continue
+
+            token = chord_token(chord_pitch, chord_type_id)
+
+            if not tokens or tokens[-1] != token:
+                tokens.append(token)
+                chords.append((chord_id, chart_id, measure_id))
+
+        for position in range(len(tokens) - GRAM_SIZE + 1):
+            chord_id, chart_id, measure_id = chords[position]
+            yield (
+                chord_id,
+                progression_gram(tokens[position:position + GRAM_SIZE]),
+                chords[position + 1][0], chart_id, section_id, measure_id
+            )
+
+
+def chord_rows(chords):
+    """
+    Returns the rows for `progression_grams()` for the queryset of
+    chords `chords`.
+    """
+    return chords.order_by(
+        'measure__line__section__id', 'measure__line__number',
+        'measure__number', 'number'
+    ).values_list(
+        'chart_id', 'measure__line__section_id', 'measure_id', 'id',
+        'chord_pitch', 'chord_type_id', 'rest'
+    )
+
+
+def index_progressions(section_ids):
+    """
+    Updates the grams of the sections with the given ids to the current
+    chords, with one query for the chords and one for the stored grams.
+
+    The stored grams are compared with the current ones, and only the
+    ones that differ are deleted and inserted again. A gram is known by
+    its first chord, so changing, adding or removing a chord only
+    rewrites the grams around it, the ones that start up to two chords
+    before it.
+    """
+
+    if not section_ids:
+        return
+
+    Chord = apps.get_model('chordcharts', 'Chord')
+    ProgressionGram = apps.get_model('chordcharts', 'ProgressionGram')
+
+    grams = {
+        row[0]: row[1:]
+        for row in progression_grams(chord_rows(
+            Chord.objects.filter(measure__line__section_id__in=section_ids)
+        ))
+    }
+
+    # Grams of chords that moved to these sections are stored in their
+    # old section.
+    stored_grams = {
+        row[0]: row[1:]
+        for row in ProgressionGram.objects.filter(
+            models.Q(section_id__in=section_ids) |
+            models.Q(chord__measure__line__section_id__in=section_ids)
+        ).values_list(
+            'chord_id', 'gram', 'next_chord_id', 'chart_id', 'section_id',
+            'measure_id'
+        )
+    }
+
+    stale_ids = [
+        chord_id for chord_id, values in stored_grams.items()
+        if grams.get(chord_id) != values
+    ]
+
+    if stale_ids:
+        ProgressionGram.objects.filter(chord_id__in=stale_ids).delete()
+
+    ProgressionGram.objects.bulk_create(
+        ProgressionGram(
+            chord_id=chord_id,
+            gram=gram,
+            next_chord_id=next_chord_id,
+            chart_id=chart_id,
+            section_id=section_id,
+            measure_id=measure_id
+        )
+        for chord_id, (
+            gram, next_chord_id, chart_id, section_id, measure_id
+        ) in grams.items()
+        if stored_grams.get(chord_id) != grams[chord_id]
+    )
+
+
+def find_progression(chords):
+    """
+    Returns a queryset with the `ProgressionGram`s where the progression
+    of the given `(chord_pitch, chord_type_id)` chords starts.
+
+    The progression is split in its grams. The first gram is looked up
+    in the index and every next gram has to start at the next chord of
+    the gram before it, so the whole progression is matched in one
+    query.
+
+    Raises a `ValueError` if the progression has less than `GRAM_SIZE`
+    chords.
+    """
+
+    ProgressionGram = apps.get_model('chordcharts', 'ProgressionGram')
+    tokens = progression_tokens(chords)
+
+    if len(tokens) < GRAM_SIZE:
+        raise ValueError(
+            "A progression needs at least {} chords, not counting "
+            "repeated chords.".format(GRAM_SIZE)
+        )
+
+    lookups = {'gram': progression_gram(tokens[:GRAM_SIZE])}
+    path = ''
+
+    for offset in range(1, len(tokens) - GRAM_SIZE + 1):
+        path += 'next_chord__progression_gram__'
+        lookups[path + 'gram'] = progression_gram(
+            tokens[offset:offset + GRAM_SIZE]
+        )
+
+    return ProgressionGram.objects.filter(**lookups)
@@ -0,0 +1,39 @@
+import json
+
+from django.core.cache import caches
+
+
+CACHE_ALIAS = 'chart_renders'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def get_rendered_chart(chart, key, edit, render):
+    """
+    Returns a `(chart_data, chart_json)` tuple for the given `chart`,
+    shown in `key` (or `None` for the original key) and in edit mode if
+    `edit` is `True`.
+
+    Renders are cached per revision of the chart, so every change to
+    the chart makes the previous renders unreachable. If there's no
+    cached render, `render` is called to get the chart data, and the
+    result is cached.
+    """
+
+    cache = get_cache()
+    cache_key = 'chart:{}:{}:{}:{}'.format(
+        chart.id,
+        chart.revision,
+        key.slug if key else '',
+        'edit' if edit else 'view'
+    )
+    rendered = cache.get(cache_key)
+
+    if rendered is None:
+        chart_data = render()
+        rendered = (chart_data, json.dumps(chart_data))
+        cache.set(cache_key, rendered)
+
+    return rendered
@@ -1,16 +1,90 @@
+from collections import namedtuple
+
 from django.db.models import Q
 from haystack.query import SearchQuerySet
+from songs.song_names import get_song_name_index
 from ..models import Chart
+from .chart_pages import chart_page
 
 
-def search_charts(search_term, user=None):
+# The maximum number of songs or search results that the charts of a
+# search are looked up for. Their ids go in one `IN` clause, which has
+# to stay below the limit of 999 parameters of SQLite.
+MAX_SEARCH_RESULTS = 500
 
-    if not user or user.is_anonymous():
-        filters = Q(public=True)
-    else:
-        filters = Q(public=True) | Q(owner_id=user.id)
+# A search result made from the database, with the same attributes as
+# the fields stored in the `ChartIndex`.
+ChartResult = namedtuple('ChartResult', (
+    'song_name', 'pk', 'song_id', 'song_slug', 'short_description'
+))
+
+
+def search_charts(search_term, user=None):
 
     return SearchQuerySet().models(Chart).filter(
-        filters,
+        visible_filters(user),
         content_auto=search_term
     )
+
+
+def find_charts(search_term, user=None):
+    """
+    Returns a queryset with the charts that match `search_term`.
+
+    The charts of the songs with a name that matches `search_term` in
+    the in-memory song name index are filtered on their songs. Only if
+    no song name matches, the search index is used, which handles the
+    search terms that aren't a prefix of the words in a song name.
+
+    Only the charts of the first `MAX_SEARCH_RESULTS` songs by name, or
+    the first `MAX_SEARCH_RESULTS` results of the search index by
+    relevance, are returned.
+    """
+
+    # The search index can be behind on the charts, so the visibility is
+    # checked on the charts themselves too.
+    charts = Chart.objects.filter(visible_filters(user))
+
+    song_ids = [
+        song_id for song_id, _
+        in get_song_name_index().search(search_term)[:MAX_SEARCH_RESULTS]
+    ]
+
+    if song_ids:
+        return charts.filter(song_id__in=song_ids)
+
+    chart_ids = [
+        int(search_result.pk)
+        for search_result
+        in search_charts(search_term, user)[:MAX_SEARCH_RESULTS]
+    ]
+
+    return charts.filter(id__in=chart_ids)
+
+
+def autocomplete_charts(search_term, user=None, cursor=None):
+    """
+    Returns a `(results, next_cursor)` tuple with a page of the charts
+    that match `search_term`, as `ChartResult`s ordered by song name.
+    See `chart_page()` for the cursor.
+    """
+
+    page, next_cursor = chart_page(
+        find_charts(search_term, user).values_list(
+            'song__name', 'id', 'song_id', 'song__slug', 'short_description'
+        ),
+        cursor
+    )
+
+    return [ChartResult(*row) for row in page], next_cursor
+
+
+def visible_filters(user):
+    """
+    Returns the filters for the charts `user` can see.
+    """
+
+    if not user or user.is_anonymous():
+        return Q(public=True)
+    else:
+        return Q(public=True) | Q(owner_id=user.id)
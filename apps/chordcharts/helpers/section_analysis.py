@@ -0,0 +1,301 @@
+from collections import defaultdict
+
+
+# The amount of equal measures a line needs to repeat another line.
+MIN_EQUAL_COUNT = 4
+
+
+class SectionAnalysis():
+    """
+    Analyzes the subsections and repeating measures of all lines in a
+    section at once.
+
+    `Line.repeating_measures()` works per line and recursively asks the
+    previous and next lines for their repeating measures, comparing
+    measures chord by chord every time. This class first turns every
+    measure into a signature that's equal for equal measures and then
+    walks the lines once, reusing the result of the previous line and
+    finding repeated lines with a lookup on their first measures, so the
+    whole section is analyzed in linear time without queries. The
+    results are the same as those of the properties and methods on
+    `Line`, for measures that have as many chords as their beat schema
+    has parts, like the editor makes them (see `measure_signature()`
+    for rests).
+
+    Works on the nodes of a `ChartTree`.
+    """
+
+    def __init__(self, section):
+
+        self.section = section
+        self.merge_with_next_line = {}
+        self.subsection_number = {}
+        self.subsection_line_number = {}
+        self.matches = {}
+        self.context_info = {}
+
+        if section.show_sidebar:
+            self.analyze()
+        else:
+            for line in section.lines:
+                self.merge_with_next_line[line] = False
+                self.subsection_number[line] = False
+                self.subsection_line_number[line] = False
+                self.matches[line] = False
+
+    def repeating_measures(self, line, context_info=True):
+        """
+        Returns the same result as `Line.repeating_measures()` for the
+        given `line`.
+        """
+
+        match = self.matches[line]
+
+        if match and context_info:
+            match = dict(match, **self.context_info[line])
+
+        return match
+
+    def analyze(self):
+
+        lines = self.section.lines
+        beats = self.section.time_signature.beats
+
+        self.signatures = {}
+        self.repeating_prev_measures = {}
+
+        for line in lines:
+
+            signatures = [measure_signature(m) for m in line.measures]
+            first_beats = [
+                m.chords[0].beats if m.chords else None
+                for m in line.measures
+            ]
+
+            self.signatures[line] = signatures
+            self.repeating_prev_measures[line] = [False] + [
+                bool(signature[1] and prev_signature[1]) and
+                prev_beats == first_beats[index + 1] == beats and
+                signature[1][0] == prev_signature[1][0]
+                for index, (prev_signature, signature, prev_beats) in
+                enumerate(zip(signatures, signatures[1:], first_beats))
+            ]
+
+        self.analyze_subsections()
+        self.analyze_matches()
+        self.analyze_context_info()
+
+    def analyze_subsections(self):
+        """
+        Determines `merge_with_next_line`, `subsection_number` and
+        `subsection_line_number` for every line.
+        """
+
+        lines = self.section.lines
+        letter_counts = defaultdict(int)
+        prev_line = None
+
+        for index, line in enumerate(lines):
+
+            next_line = lines[index + 1] if index + 1 < len(lines) else None
+            merge_with_next_line = bool(
+                line._merge_with_next_line and
+                next_line and
+                next_line.letter == line.letter
+            )
+
+            if prev_line and self.merge_with_next_line[prev_line]:
+                subsection_line_number = (
+                    self.subsection_line_number[prev_line] + 1
+                )
+            else:
+                subsection_line_number = 1
+
+            self.merge_with_next_line[line] = merge_with_next_line
+            self.subsection_number[line] = letter_counts[line.letter] + 1
+            self.subsection_line_number[line] = subsection_line_number
+
+            if not merge_with_next_line:
+                letter_counts[line.letter] += 1
+
+            prev_line = line
+
+    def analyze_matches(self):
+        """
+        Finds the repeated line for every line, without the context
+        info.
+
+        A line repeats the first earlier line in its group of the same
+        letter and subsection line number that has the same first
+        measures, as many as needed for an equal count of 4 (see
+        `get_match_length()`). Every line is put in an index on the
+        signatures of its first measures, so the matching line is found
+        with a single lookup.
+        """
+
+        candidates = {}
+        prev_line = None
+
+        for line in self.section.lines:
+
+            group = (line.letter, self.subsection_line_number[line])
+            signatures = tuple(self.signatures[line])
+            match = False
+
+            length = self.get_match_length(line)
+
+            if length and not (
+                prev_line and
+                self.merge_with_next_line[prev_line] and
+                not self.is_full_line_repeat(self.matches[prev_line])
+            ):
+
+                for candidate in candidates.get(
+                    (group, signatures[:length]), ()
+                ):
+
+                    if (
+                        self.subsection_number[candidate] ==
+                        self.subsection_number[line]
+                    ):
+                        continue
+
+                    match = {
+                        'line': candidate,
+                        'amount': self.get_equal_count(candidate, line)
+                    }
+                    break
+
+            self.matches[line] = match
+
+            for length in range(MIN_EQUAL_COUNT, len(signatures) + 1):
+                candidates.setdefault(
+                    (group, signatures[:length]), []
+                ).append(line)
+
+            prev_line = line
+
+    def analyze_context_info(self):
+        """
+        Determines `span_next_line` and `span_prev_line` for every line
+        that repeats another line.
+        """
+
+        lines = self.section.lines
+
+        for index, line in enumerate(lines):
+
+            match = self.matches[line]
+
+            if not match:
+                continue
+
+            prev_line = lines[index - 1] if index > 0 else None
+            next_line = lines[index + 1] if index + 1 < len(lines) else None
+
+            self.context_info[line] = {
+                'span_next_line': bool(
+                    self.is_full_line_repeat(match) and
+                    self.merge_with_next_line[line] and
+                    self.matches[next_line]
+                ),
+                'span_prev_line': bool(
+                    prev_line and
+                    self.merge_with_next_line[prev_line] and
+                    self.is_full_line_repeat(self.matches[prev_line])
+                )
+            }
+
+    def get_equal_count(self, line, this_line):
+        """
+        Returns the amount of measures starting from measure 1 that are
+        equal in `line` and `this_line`, minus the trailing measures
+        that repeat their previous measure.
+        """
+
+        equal_count = 0
+
+        for line_signature, this_line_signature in zip(
+            self.signatures[line], self.signatures[this_line]
+        ):
+
+            if line_signature != this_line_signature:
+                break
+
+            equal_count += 1
+
+        return equal_count - self.trailing_repeats(this_line, equal_count)
+
+    def get_match_length(self, line):
+        """
+        Returns the amount of first measures another line needs to have
+        in common with `line` to be repeated by it, or `None` if no line
+        can be.
+
+        The equal count of `get_equal_count()` never decreases when more
+        measures are equal, so every line that has at least this many
+        first measures in common has an equal count of
+        `MIN_EQUAL_COUNT` or more.
+        """
+
+        for length in range(
+            MIN_EQUAL_COUNT, len(self.signatures[line]) + 1
+        ):
+            if (
+                length - self.trailing_repeats(line, length) >=
+                MIN_EQUAL_COUNT
+            ):
+                return length
+
+        return None
+
+    def trailing_repeats(self, line, length):
+        """
+        Returns the amount of measures at the end of the first `length`
+        measures of `line` that are followed by a measure that repeats
+        its previous measure.
+        """
+
+        repeating_prev_measures = self.repeating_prev_measures[line]
+        count = 0
+
+        for index in range(length):
+            if (
+                index + 1 < len(repeating_prev_measures) and
+                repeating_prev_measures[index + 1]
+            ):
+                count += 1
+            else:
+                count = 0
+
+        return count
+
+    def is_full_line_repeat(self, match):
+        """
+        Returns whether the given `match` repeats all measures of the
+        line it repeats.
+        """
+        return bool(match) and (
+            match['amount'] == len(match['line'].measures)
+        )
+
+
+def measure_signature(measure):
+    """
+    Returns a signature for the given `measure` that's equal to the
+    signatures of the measures that `Measure.equal_to()` considers
+    equal, so that signatures can be compared and looked up as they
+    are.
+
+    The signature is the beat schema together with the notation of
+    every chord, or `None` for rests, because rests are equal whatever
+    their notation is. Unlike with `Chord.equal_to()`, a rest is never
+    equal to a chord that happens to have the notation of the rest.
+    """
+    return (
+        measure.beat_schema,
+        tuple(
+            None if chord.rest else chord.chord_notation
+            for chord in measure.chords
+        )
+    )
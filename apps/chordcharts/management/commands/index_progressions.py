@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chordcharts.models import Section
+from chordcharts.helpers.progressions import index_progressions
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Builds the index of the chord progressions of all charts again, "
+        "for example after loading data without signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=100,
+            help="The number of sections to index in one transaction."
+        )
+
+    def handle(self, *args, **options):
+
+        section_ids = list(
+            Section.objects.order_by('id').values_list('id', flat=True)
+        )
+        batch_size = options['batch_size']
+
+        for start in range(0, len(section_ids), batch_size):
+            with transaction.atomic():
+                index_progressions(section_ids[start:start + batch_size])
+
+        self.stdout.write("Indexed {} sections.".format(len(section_ids)))
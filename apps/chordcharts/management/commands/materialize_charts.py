@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from chordcharts.models import Chart
+from chordcharts.helpers.materialized_chart import materialize_chart
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Builds the materialized documents of the charts that don't have "
+        "them yet or have outdated ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            dest='all',
+            default=False,
+            help="Rebuild the documents of all charts."
+        )
+
+    def handle(self, *args, **options):
+
+        # Charts without sections don't have a key yet, so they can't be
+        # rendered.
+        charts = (
+            Chart.objects.filter(sections__isnull=False)
+            .distinct().order_by('id')
+        )
+
+        if not options['all']:
+            charts = charts.filter(
+                Q(materialized__isnull=True) |
+                Q(materialized__revision__lt=F('revision'))
+            )
+
+        count = 0
+
+        for chart in charts.iterator():
+            _, written = materialize_chart(chart, force=options['all'])
+            count += written
+
+        self.stdout.write("Materialized {} charts.".format(count))
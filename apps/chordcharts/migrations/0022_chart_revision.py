@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0021_auto_20150902_1417'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chart',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Increases every time the chart or one of its sections, lines,\n            measures or chords changes.'),
+        ),
+    ]
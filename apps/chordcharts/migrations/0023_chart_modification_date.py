@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0022_chart_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chart',
+            name='modification_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, help_text='The last time the revision of the chart increased.'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0023_chart_modification_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chart',
+            name='needs_cleanup',
+            field=models.BooleanField(default=True, editable=False, help_text="Set when sections, lines, measures or chords are added, removed\n            or changed, so the chart is cleaned up the next time it's\n            edited."),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+def set_descendants_chart(apps, schema_editor):
+    """
+    Sets the chart of all existing lines, measures and chords to the
+    chart of their parent, with one UPDATE per model.
+    """
+
+    quote_name = schema_editor.quote_name
+
+    for model_name, parent_model_name, parent_field in (
+        ('Line', 'Section', 'section'),
+        ('Measure', 'Line', 'line'),
+        ('Chord', 'Measure', 'measure')
+    ):
+
+        model = apps.get_model('chordcharts', model_name)
+        parent_model = apps.get_model('chordcharts', parent_model_name)
+        table = quote_name(model._meta.db_table)
+        parent_table = quote_name(parent_model._meta.db_table)
+
+        schema_editor.execute(
+            'UPDATE {table} SET {chart} = ('
+            'SELECT {parent_table}.{chart} FROM {parent_table} '
+            'WHERE {parent_table}.{id} = {table}.{parent})'.format(
+                table=table,
+                parent_table=parent_table,
+                chart=quote_name('chart_id'),
+                id=quote_name('id'),
+                parent=quote_name(
+                    model._meta.get_field(parent_field).column
+                )
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0025_descendants_chart'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_descendants_chart, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0026_set_descendants_chart'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='line',
+            name='chart',
+            field=models.ForeignKey(related_name='+', editable=False, to='chordcharts.Chart', help_text='The chart this line is in. The same as the chart of the\n            section, kept on the line so that it can be found without\n            joins. Set automatically when the line is created.'),
+        ),
+        migrations.AlterField(
+            model_name='measure',
+            name='chart',
+            field=models.ForeignKey(related_name='+', editable=False, to='chordcharts.Chart', help_text='The chart this measure is in. The same as the chart of the\n            line, kept on the measure so that it can be found without\n            joins. Set automatically when the measure is created.'),
+        ),
+        migrations.AlterField(
+            model_name='chord',
+            name='chart',
+            field=models.ForeignKey(related_name='+', editable=False, to='chordcharts.Chart', help_text='The chart this chord is in. The same as the chart of the\n            measure, kept on the chord so that it can be found without\n            joins. Set automatically when the chord is created.'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0027_descendants_chart_not_null'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterializedChart',
+            fields=[
+                ('chart', models.OneToOneField(related_name='materialized', primary_key=True, serialize=False, to='chordcharts.Chart', help_text='The chart the documents are built from.')),
+                ('revision', models.PositiveIntegerField(help_text='The revision of the chart the documents are built from.')),
+                ('document', models.TextField(help_text='The client data of the chart in its own key, as JSON.')),
+                ('edit_document', models.TextField(help_text='The client data of the chart in its own key in edit mode, as\n            JSON.')),
+            ],
+        ),
+    ]
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import struct
+from collections import defaultdict
+
+from django.db import models, migrations
+
+
+# A copy of the packing in `helpers.packed_chords` at the time of this
+# migration, so that this migration keeps writing the same bytes when
+# the helper changes.
+CHORD_STRUCT = struct.Struct('>HHIHB')
+
+REST = 1
+ALT_BASS = 2
+CHORD_NOTE_ALT_NOTATION = 4
+ALT_BASS_NOTE_ALT_NOTATION = 8
+
+PACKED_FIELDS = (
+    'chord_pitch', 'alt_bass_pitch', 'chord_type_id', 'beats', 'rest',
+    'alt_bass', '_chord_note_alt_notation', '_alt_bass_note_alt_notation'
+)
+
+# The amount of measures updated per query. Every measure takes three
+# parameters, which keeps a query below the 999 of SQLite.
+BATCH_SIZE = 300
+
+
+def pack_chord(
+    chord_pitch, alt_bass_pitch, chord_type_id, beats, rest, alt_bass,
+    chord_note_alt_notation, alt_bass_note_alt_notation
+):
+
+    flags = (
+        (REST if rest else 0) |
+        (ALT_BASS if alt_bass else 0) |
+        (CHORD_NOTE_ALT_NOTATION if chord_note_alt_notation else 0) |
+        (ALT_BASS_NOTE_ALT_NOTATION if alt_bass_note_alt_notation else 0)
+    )
+
+    return CHORD_STRUCT.pack(
+        chord_pitch, alt_bass_pitch, chord_type_id, beats, flags
+    )
+
+
+def pack_measure_chords(apps, schema_editor):
+    """
+    Packs the chords of all existing measures, with one query for the
+    chords and one UPDATE per batch of measures.
+    """
+
+    Measure = apps.get_model('chordcharts', 'Measure')
+    Chord = apps.get_model('chordcharts', 'Chord')
+
+    measure_ids = list(
+        Measure.objects.order_by('id').values_list('id', flat=True)
+    )
+
+    for start in range(0, len(measure_ids), BATCH_SIZE):
+
+        batch = measure_ids[start:start + BATCH_SIZE]
+        rows = defaultdict(list)
+
+        for row in (
+            Chord.objects.filter(measure_id__in=batch)
+            .order_by('number')
+            .values_list('measure_id', *PACKED_FIELDS)
+        ):
+            rows[row[0]].append(pack_chord(*row[1:]))
+
+        Measure.objects.filter(id__in=batch).update(
+            packed_chords=models.Case(
+                *[
+                    models.When(
+                        id=measure_id,
+                        then=models.Value(b''.join(rows[measure_id]))
+                    )
+                    for measure_id in batch
+                ],
+                output_field=models.BinaryField()
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0028_materializedchart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measure',
+            name='packed_chords',
+            field=models.BinaryField(null=True, editable=False, help_text='The chords of this measure packed in a fixed amount of bytes\n            per chord, in the order of their numbers, so that measures can be\n            compared without loading the chords. Kept in sync when the chords\n            change. Null if the chords aren\'t packed yet, in which case\n            they\'re packed when they\'re needed. See\n            `helpers.packed_chords`.'),
+        ),
+        migrations.RunPython(pack_measure_chords, migrations.RunPython.noop),
+    ]
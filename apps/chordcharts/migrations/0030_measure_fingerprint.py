@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import struct
+
+from django.db import models, migrations
+
+
+# A copy of the fingerprint in `helpers.packed_chords` at the time of
+# this migration, so that this migration keeps calculating the same
+# fingerprints when the helper changes.
+CHORD_STRUCT = struct.Struct('>HHIHB')
+
+REST = 1
+ALT_BASS = 2
+CHORD_NOTE_ALT_NOTATION = 4
+ALT_BASS_NOTE_ALT_NOTATION = 8
+
+# The amount of measures updated per query. Every measure takes three
+# parameters, which keeps a query below the 999 of SQLite.
+BATCH_SIZE = 300
+
+
+def measure_fingerprint(beat_schema, packed):
+
+    content = [beat_schema.encode(), b'\0']
+
+    for offset in range(0, len(packed), CHORD_STRUCT.size):
+
+        chord_pitch, alt_bass_pitch, chord_type_id, _, flags = (
+            CHORD_STRUCT.unpack_from(packed, offset)
+        )
+
+        if flags & REST:
+            content.append(CHORD_STRUCT.pack(0, 0, 0, 0, REST))
+        elif flags & ALT_BASS:
+            content.append(CHORD_STRUCT.pack(
+                chord_pitch, alt_bass_pitch, chord_type_id, 0,
+                flags & (
+                    ALT_BASS | CHORD_NOTE_ALT_NOTATION |
+                    ALT_BASS_NOTE_ALT_NOTATION
+                )
+            ))
+        else:
+            content.append(CHORD_STRUCT.pack(
+                chord_pitch, 0, chord_type_id, 0,
+                flags & CHORD_NOTE_ALT_NOTATION
+            ))
+
+    digest = hashlib.sha1(b''.join(content)).digest()
+
+    return struct.unpack('>q', digest[:8])[0]
+
+
+def set_measure_fingerprints(apps, schema_editor):
+    """
+    Calculates the fingerprints of all existing measures from their
+    packed chords, with one query and one UPDATE per batch of measures.
+    """
+
+    Measure = apps.get_model('chordcharts', 'Measure')
+
+    measure_ids = list(
+        Measure.objects.exclude(packed_chords=None)
+        .order_by('id').values_list('id', flat=True)
+    )
+
+    for start in range(0, len(measure_ids), BATCH_SIZE):
+
+        fingerprints = {
+            measure_id: measure_fingerprint(beat_schema, bytes(packed))
+            for measure_id, beat_schema, packed in (
+                Measure.objects
+                .filter(id__in=measure_ids[start:start + BATCH_SIZE])
+                .values_list('id', 'beat_schema', 'packed_chords')
+            )
+        }
+
+        Measure.objects.filter(id__in=fingerprints).update(
+            fingerprint=models.Case(
+                *[
+                    models.When(id=measure_id, then=models.Value(value))
+                    for measure_id, value in fingerprints.items()
+                ],
+                output_field=models.BigIntegerField()
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0029_measure_packed_chords'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measure',
+            name='fingerprint',
+            field=models.BigIntegerField(null=True, editable=False, db_index=True, help_text='A hash of the beat schema and the chords of this measure,\n            relative to the key. Measures in the same key with the same\n            fingerprint are equal, and measures with the same content can be\n            found with the index, also in other charts. Kept in sync together\n            with `packed_chords`. Null if it isn\'t calculated yet.'),
+        ),
+        migrations.RunPython(set_measure_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0030_measure_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='chart',
+            index_together=set([('song', 'id'), ('owner', 'song', 'id')]),
+        ),
+    ]
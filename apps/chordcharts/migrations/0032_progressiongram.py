@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from itertools import groupby
+
+from django.db import models, migrations
+
+
+# A copy of the grams in `helpers.progressions` at the time of this
+# migration, so that this migration keeps building the same index when
+# the helper changes.
+GRAM_SIZE = 3
+CHORD_BITS = 20
+
+
+def progression_grams(rows):
+    """
+    Generates the grams of the chords in `rows` as
+    `(chord_id, gram, next_chord_id, chart_id, section_id, measure_id)`
+    tuples, like `helpers.progressions.progression_grams()`.
+    """
+
+    for section_id, section_rows in groupby(rows, key=lambda row: row[1]):
+
+        tokens = []
+        chords = []
+
+        for (
+            chart_id, _, measure_id, chord_id, chord_pitch, chord_type_id,
+            rest
+        ) in section_rows:
+
+            if rest:
+                continue
+
+            token = chord_type_id * 12 + chord_pitch % 12
+
+            if not tokens or tokens[-1] != token:
+                tokens.append(token)
+                chords.append((chord_id, chart_id, measure_id))
+
+        for position in range(len(tokens) - GRAM_SIZE + 1):
+
+            gram = 0
+
+            for token in tokens[position:position + GRAM_SIZE]:
+                gram = (gram << CHORD_BITS) | token
+
+            chord_id, chart_id, measure_id = chords[position]
+
+            yield (
+                chord_id, gram, chords[position + 1][0], chart_id,
+                section_id, measure_id
+            )
+
+
+def index_all_progressions(apps, schema_editor):
+    """
+    Builds the grams of the progressions of all existing charts.
+    """
+
+    Chord = apps.get_model('chordcharts', 'Chord')
+    ProgressionGram = apps.get_model('chordcharts', 'ProgressionGram')
+    grams = []
+
+    rows = Chord.objects.order_by(
+        'measure__line__section__id', 'measure__line__number',
+        'measure__number', 'number'
+    ).values_list(
+        'chart_id', 'measure__line__section_id', 'measure_id', 'id',
+        'chord_pitch', 'chord_type_id', 'rest'
+    )
+
+    for (
+        chord_id, gram, next_chord_id, chart_id, section_id, measure_id
+    ) in progression_grams(rows.iterator()):
+
+        grams.append(ProgressionGram(
+            chord_id=chord_id,
+            gram=gram,
+            next_chord_id=next_chord_id,
+            chart_id=chart_id,
+            section_id=section_id,
+            measure_id=measure_id
+        ))
+
+        if len(grams) == 1000:
+            ProgressionGram.objects.bulk_create(grams)
+            grams = []
+
+    ProgressionGram.objects.bulk_create(grams)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chordcharts', '0031_chart_song_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressionGram',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', primary_key=True, serialize=False, auto_created=True)),
+                ('chord', models.OneToOneField(help_text='The first chord of the progression.', related_name='progression_gram', to='chordcharts.Chord')),
+                ('gram', models.BigIntegerField(db_index=True, help_text='The chords of the progression as one number, see\n            `progression_gram()`.')),
+                ('next_chord', models.ForeignKey(help_text='The chord after the first chord of the progression, where the\n            next gram in the section starts, without rests and repeated\n            chords.', related_name='+', to='chordcharts.Chord')),
+                ('chart', models.ForeignKey(help_text='The chart the progression is in.', related_name='+', to='chordcharts.Chart')),
+                ('section', models.ForeignKey(help_text='The section the progression is in.', related_name='progression_grams', to='chordcharts.Section')),
+                ('measure', models.ForeignKey(help_text='The measure with the first chord of the progression.', related_name='+', to='chordcharts.Measure')),
+            ],
+        ),
+        migrations.RunPython(index_all_progressions, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,9 @@
 # coding=utf8
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete
+)
+from django.dispatch import receiver
 from django.utils import timezone
 
 from core.helpers.number_to_ordinal import number_to_ordinal
@@ -7,6 +11,17 @@ from users.models import User
 from songs.models import Song
 from .settings import BOXED_CHART
 from .managers import ChartManager
+from .revisions import (
+    revision_batch, record_change, record_measure_change,
+    record_progression_change, record_chart_delete, forget_chart_delete,
+    record_measure_delete, forget_measure_delete, chart_deleted, CHART_LOOKUP,
+    SECTION_LOOKUP, SECTION_CHART_LOOKUP, SECTION_MEASURE_LOOKUP
+)
+from .helpers.packed_chords import (
+    PACKED_FIELDS, pack_chords, unpack_chords, packed_chords_equal,
+    chords_equal, measure_fingerprint
+)
+from .reference_data import get_reference_data, invalidate_reference_data
 
 
 class Key(models.Model):
@@ -94,14 +109,17 @@ class Key(models.Model):
             'tonic': self.tonic,
             'tonality': self.tonality,
             'distance_from_c': self.distance_from_c,
-            'notes': [note.client_data() for note in self.notes.all()]
+            'notes': [
+                note.client_data()
+                for note in get_reference_data().notes(self.id)
+            ]
         }
 
     def note(self, distance_from_root, accidental=0):
         """
         Get the note of this key at `distance_from_root`.
         """
-        return self.notes.get(distance_from_root=distance_from_root)
+        return get_reference_data().note(self.id, distance_from_root)
 
 
 class Note(models.Model):
@@ -248,8 +266,71 @@ class PermissionMixin():
         """
         Returns a boolean indicating whether the given `user` has
         permission to change this instance.
+
+        Compares the ids, so that the owner doesn't have to be loaded,
+        see `get_chart_owner_id()`.
         """
-        return user == self.owner
+        return user.pk is not None and user.pk == get_chart_owner_id(
+            user, self
+        )
+
+
+class ChartPartMixin():
+    """
+    For the sections, lines, measures and chords of a chart.
+
+    Remembers the id of the parent and the chart the object was loaded
+    with, so that `set_chart()` and `update_descendants_chart()` can
+    tell when it moved to another parent or chart.
+    """
+
+    # The foreign key to the parent of the object.
+    parent_field = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+
+        instance = super().from_db(db, field_names, values)
+
+        # Deferred fields aren't in `__dict__`, and loading them here
+        # would cost a query.
+        instance.loaded_parent_id = instance.__dict__.get(
+            cls.parent_field + '_id'
+        )
+        instance.loaded_chart_id = instance.__dict__.get('chart_id')
+
+        return instance
+
+
+def get_chart_owner_id(user, obj):
+    """
+    Returns the id of the owner of `obj`, which is a chart or a section,
+    line, measure or chord in a chart, or `None` if it isn't in a chart
+    yet.
+
+    The owner of an object in a chart is looked up by its `chart_id`,
+    with at most one query per chart. The owners are kept on `user`,
+    which lives as long as the request, so checking more objects of the
+    same chart doesn't need queries.
+    """
+
+    if isinstance(obj, Chart):
+        return obj.owner_id
+
+    if obj.chart_id is None:
+        return None
+
+    if not hasattr(user, '_chart_owner_ids'):
+        user._chart_owner_ids = {}
+
+    if obj.chart_id not in user._chart_owner_ids:
+        user._chart_owner_ids[obj.chart_id] = (
+            Chart.objects.filter(id=obj.chart_id)
+            .values_list('owner_id', flat=True)
+            .first()
+        )
+
+    return user._chart_owner_ids[obj.chart_id]
 
 
 class Chart(models.Model, PermissionMixin):
@@ -271,6 +352,30 @@ class Chart(models.Model, PermissionMixin):
     video_url = models.CharField(max_length=500, default="", blank=True)
     lyrics_url = models.CharField(max_length=500, default="", blank=True)
     public = models.BooleanField(default=False)
+    revision = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text=(
+            """Increases every time the chart or one of its sections, lines,
+            measures or chords changes."""
+        )
+    )
+    modification_date = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        help_text=(
+            """The last time the revision of the chart increased."""
+        )
+    )
+    needs_cleanup = models.BooleanField(
+        default=True,
+        editable=False,
+        help_text=(
+            """Set when sections, lines, measures or chords are added, removed
+            or changed, so the chart is cleaned up the next time it's
+            edited."""
+        )
+    )
 
     objects = ChartManager()
 
@@ -279,17 +384,43 @@ class Chart(models.Model, PermissionMixin):
 
     class Meta():
         ordering = ['song__name']
+        # For the pages of charts of a song or a user, which are ordered
+        # by song name and id.
+        index_together = [['song', 'id'], ['owner', 'song', 'id']]
+
+    def save(self, *args, **kwargs):
+
+        # The revision, modification date and cleanup flag are only
+        # changed with UPDATEs in the database, so never save them from
+        # a possibly outdated instance.
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in (
+                    'revision', 'modification_date', 'needs_cleanup'
+                )
+            ]
+
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+
+        # The sections, lines, measures and chords are deleted one by one
+        # in the cascade, so batch their changes.
+        with revision_batch():
+            super().delete(*args, **kwargs)
 
     def client_data(self, edit=False, transpose_to_tonic=None):
 
+        reference_data = get_reference_data()
+        key = self.key
+
         if transpose_to_tonic:
-            key = Key.objects.get(
-                tonic=transpose_to_tonic,
-                tonality=self.key.tonality
+            interval = reference_data.transpose_interval(
+                key.id, transpose_to_tonic
             )
-            interval = self.get_transpose_interval(transpose_to_tonic)
+            key = reference_data.key_by_tonic(transpose_to_tonic, key.tonality)
         else:
-            key = self.key
             interval = 0
 
         sections_client_data = []
@@ -319,7 +450,7 @@ class Chart(models.Model, PermissionMixin):
 
         This is just the key of the first section.
         """
-        return self.sections.first().key
+        return get_reference_data().key(self.sections.first().key_id)
 
     def transpose(self, tonic):
         """
@@ -330,11 +461,43 @@ class Chart(models.Model, PermissionMixin):
         `tonic`.
         """
 
-        interval = self.get_transpose_interval(tonic)
+        reference_data = get_reference_data()
+        sections = Section.objects.filter(chart_id=self.id)
 
-        for section in self.sections.all():
-            section.transpose_with_interval(interval)
-            section.save()
+        with revision_batch():
+
+            # The sections are locked, so that their keys can't change
+            # between reading and updating them. The first section has
+            # the key of the chart.
+            key_ids = list(
+                sections.select_for_update()
+                .values_list('key_id', flat=True)
+            )
+
+            if not key_ids:
+                return
+
+            interval = reference_data.transpose_interval(key_ids[0], tonic)
+
+            # Update all sections with one UPDATE, mapping every key used
+            # in the chart to its transposed key. Sections added since
+            # they were read keep their key.
+            sections.update(key=models.Case(
+                *[
+                    models.When(
+                        key_id=key_id,
+                        then=models.Value(
+                            reference_data.transposed_key(
+                                key_id, interval
+                            ).id
+                        )
+                    )
+                    for key_id in set(key_ids)
+                ],
+                default=models.F('key_id'),
+                output_field=models.IntegerField()
+            ))
+            record_change(CHART_LOOKUP, self.id)
 
     def get_transpose_interval(self, tonic):
         """
@@ -342,10 +505,7 @@ class Chart(models.Model, PermissionMixin):
         the tonic of the key of the chart (which is the same as the
         tonic of the key of the first section).
         """
-        return (
-            Key.objects.get(tonic=tonic, tonality=1).distance_from_c -
-            self.sections.first().key.distance_from_c
-        )
+        return get_reference_data().transpose_interval(self.key.id, tonic)
 
     def cleanup(self):
         """
@@ -359,17 +519,78 @@ class Chart(models.Model, PermissionMixin):
             - sections that don't have any lines
             - lines that don't have any measures
             - measures that don't have any chords
+
+        Chords that don't fit in the beat schema of their measure are
+        removed too.
+
+        The chart is only cleaned up if it changed structurally since the
+        last cleanup (see `needs_cleanup`), and then with a few queries
+        for the whole chart. Returns whether the chart was cleaned up.
         """
 
-        for section in self.sections.all():
-            section.cleanup()
+        if not self.needs_cleanup:
+            return False
 
-        number = 0
+        sections = Section.objects.filter(chart_id=self.id)
+        lines = Line.objects.filter(chart_id=self.id)
+        measures = Measure.objects.filter(chart_id=self.id)
+        chords = Chord.objects.filter(chart_id=self.id)
 
-        for section in self.sections.all():
-            number += 1
-            section.number = number
-            section.save()
+        with transaction.atomic():
+
+            with revision_batch():
+
+                beat_schemas = set(
+                    measures.values_list('beat_schema', flat=True)
+                )
+
+                for beat_schema in beat_schemas:
+                    chords.filter(
+                        measure__beat_schema=beat_schema,
+                        number__gt=len(beat_schema.split('-'))
+                    ).delete()
+
+                measures.filter(chords__isnull=True).delete()
+                lines.filter(measures__isnull=True).delete()
+                sections.filter(lines__isnull=True).delete()
+
+                self.renumber_sections()
+
+            # The deletes above mark the chart as needing a cleanup when
+            # the batch ends, so this has to come after it.
+            Chart.objects.filter(id=self.id).update(needs_cleanup=False)
+
+        self.needs_cleanup = False
+
+        return True
+
+    def renumber_sections(self):
+        """
+        Numbers the sections from 1 without gaps, in their current
+        order, with one UPDATE.
+        """
+
+        new_numbers = {}
+
+        for number, (section_id, old_number) in enumerate(
+            Section.objects.filter(chart_id=self.id)
+            .values_list('id', 'number'),
+            1
+        ):
+            if number != old_number:
+                new_numbers[section_id] = number
+
+        if new_numbers:
+            Section.objects.filter(id__in=new_numbers).update(
+                number=models.Case(
+                    *[
+                        models.When(id=section_id, then=models.Value(number))
+                        for section_id, number in new_numbers.items()
+                    ],
+                    output_field=models.IntegerField()
+                )
+            )
+            record_change(CHART_LOOKUP, self.id)
 
 
 class TimeSignature(models.Model):
@@ -381,7 +602,19 @@ class TimeSignature(models.Model):
         return '{}/{}'.format(self.beats, self.beat_unit)
 
 
-class Section(models.Model, PermissionMixin):
+class ReferenceDataVersion(models.Model):
+    """
+    The version of the keys, notes, chord types and time signatures, in
+    a single row.
+
+    It's increased every time one of them changes, so that every process
+    loads the reference data again, see `reference_data`.
+    """
+
+    version = models.PositiveIntegerField(default=0)
+
+
+class Section(ChartPartMixin, models.Model, PermissionMixin):
     """
     A section in a chart.
 
@@ -392,6 +625,8 @@ class Section(models.Model, PermissionMixin):
         lines - The lines in this section.
     """
 
+    parent_field = 'chart'
+
     chart = models.ForeignKey(
         Chart,
         related_name='sections',
@@ -541,16 +776,12 @@ class Section(models.Model, PermissionMixin):
         If time_signature isn't set, sets it to 4/4 as a default.
         """
 
-        # If time_signature isn't set, accessing it would give a
-        # RelatedObjectDoesNotExist exception. This is a dynamic
-        # exception so we can't import it to explicitly check if it was
-        # this exception, however, this is the only expected exception
-        # in this case.
-        try:
-            self.time_signature
-        except:
-            self.time_signature = TimeSignature.objects.get(
-                beats=4, beat_unit=4
+        # Check the id instead of the related object, so that sections
+        # loaded from the database don't do a query for their time
+        # signature when they're initialized.
+        if self.time_signature_id is None:
+            self.time_signature = (
+                get_reference_data().time_signature_by_beats(4, 4)
             )
 
     def transpose_with_interval(self, interval):
@@ -558,12 +789,7 @@ class Section(models.Model, PermissionMixin):
         Transposes the key of the section using the given `interval`
         in half notes.
         """
-        self.key = Key.objects.get(
-            distance_from_c=(
-                (self.key.distance_from_c + interval) % 12
-            ),
-            tonality=self.key.tonality
-        )
+        self.key = get_reference_data().transposed_key(self.key_id, interval)
 
     def update_key(self, key):
         """
@@ -571,37 +797,31 @@ class Section(models.Model, PermissionMixin):
         chords.
         """
 
-        difference = self.key.distance_from_c - key.distance_from_c
+        difference = (
+            get_reference_data().key(self.key_id).distance_from_c -
+            key.distance_from_c
+        ) % 12
 
-        self.key = key
-        self.save()
-
-        for line in self.lines.all():
-            for measure in line.measures.all():
-                for chord in measure.chords.all():
-                    chord.chord_pitch = (chord.chord_pitch + difference) % 12
-                    chord.alt_bass_pitch = (
-                        (chord.alt_bass_pitch + difference) % 12
-                    )
-                    chord.save()
-
-    def cleanup(self):
-        """
-        Cleans up the model by removing empty children and other objects
-        that aren't needed anymore.
+        with revision_batch():
 
-        Empty children are:
-            - lines that don't have any measures
-            - measures that don't have any chords
-        """
-        for line in self.lines.all():
-            line.cleanup()
+            self.key = key
+            self.save()
 
-        if self.lines.count() == 0:
-            self.delete()
+            # The difference is positive, so the pitches stay between 0
+            # and 11 with the modulo of the database as well.
+            Chord.objects.filter(measure__line__section_id=self.id).update(
+                chord_pitch=(models.F('chord_pitch') + difference) % 12,
+                alt_bass_pitch=(models.F('alt_bass_pitch') + difference) % 12
+            )
+            record_change(CHART_LOOKUP, self.chart_id)
+            record_measure_change(
+                Measure.objects.filter(line__section_id=self.id)
+                .values_list('id', flat=True)
+            )
+            record_progression_change(SECTION_LOOKUP, {self.id})
 
 
-class Line(models.Model, PermissionMixin):
+class Line(ChartPartMixin, models.Model, PermissionMixin):
     """
     A line in a section.
 
@@ -622,12 +842,25 @@ class Line(models.Model, PermissionMixin):
         ('F', 'F'),
     )
 
+    parent_field = 'section'
+
     section = models.ForeignKey(
         Section,
         related_name='lines',
         help_text="""The section this line belongs to."""
     )
 
+    chart = models.ForeignKey(
+        Chart,
+        related_name='+',
+        editable=False,
+        help_text=(
+            """The chart this line is in. The same as the chart of the
+            section, kept on the line so that it can be found without
+            joins. Set automatically when the line is created."""
+        )
+    )
+
     number = models.PositiveSmallIntegerField(
         default=1,
         help_text=(
@@ -669,7 +902,7 @@ class Line(models.Model, PermissionMixin):
 
     @property
     def owner(self):
-        return self.section.owner
+        return self.chart.owner
 
     @property
     def merge_with_next_line(self):
@@ -1016,22 +1249,8 @@ class Line(models.Model, PermissionMixin):
         else:
             return get_match()
 
-    def cleanup(self):
-        """
-        Cleans up the model by removing empty children and other objects
-        that aren't needed anymore.
-
-        Empty children are:
-            - measures that don't have any chords
-        """
-        for measure in self.measures.all():
-            measure.cleanup()
 
-        if self.measures.count() == 0:
-            self.delete()
-
-
-class Measure(models.Model, PermissionMixin):
+class Measure(ChartPartMixin, models.Model, PermissionMixin):
     """
     A measure in a line.
 
@@ -1041,12 +1260,25 @@ class Measure(models.Model, PermissionMixin):
         chords - The chords in this measure.
     """
 
+    parent_field = 'line'
+
     line = models.ForeignKey(
         Line,
         related_name='measures',
         help_text="""The line this measure belongs to."""
     )
 
+    chart = models.ForeignKey(
+        Chart,
+        related_name='+',
+        editable=False,
+        help_text=(
+            """The chart this measure is in. The same as the chart of the
+            line, kept on the measure so that it can be found without
+            joins. Set automatically when the measure is created."""
+        )
+    )
+
     number = models.PositiveSmallIntegerField(
         default=1,
         help_text=(
@@ -1069,6 +1301,32 @@ class Measure(models.Model, PermissionMixin):
         )
     )
 
+    packed_chords = models.BinaryField(
+        null=True,
+        editable=False,
+        help_text=(
+            """The chords of this measure packed in a fixed amount of bytes
+            per chord, in the order of their numbers, so that measures can be
+            compared without loading the chords. Kept in sync when the chords
+            change. Null if the chords aren't packed yet, in which case
+            they're packed when they're needed. See
+            `helpers.packed_chords`."""
+        )
+    )
+
+    fingerprint = models.BigIntegerField(
+        null=True,
+        editable=False,
+        db_index=True,
+        help_text=(
+            """A hash of the beat schema and the chords of this measure,
+            relative to the key. Measures in the same key with the same
+            fingerprint are equal, and measures with the same content can be
+            found with the index, also in other charts. Kept in sync together
+            with `packed_chords`. Null if it isn't calculated yet."""
+        )
+    )
+
     related_field_permissions = ['line']
 
     def __str__(self):
@@ -1087,7 +1345,7 @@ class Measure(models.Model, PermissionMixin):
 
     @property
     def owner(self):
-        return self.line.owner
+        return self.chart.owner
 
     @property
     def key(self):
@@ -1131,25 +1389,78 @@ class Measure(models.Model, PermissionMixin):
         except IndexError:
             return None
 
+    def get_packed_chords(self):
+        """
+        Returns the packed chords of this measure, packing them first if
+        they aren't packed yet.
+        """
+
+        if self.packed_chords is None:
+            self.packed_chords = pack_chords(
+                self.chords.values_list(*PACKED_FIELDS)
+            )
+            Measure.objects.filter(id=self.id).update(
+                packed_chords=self.packed_chords
+            )
+
+        # Some databases return a buffer instead of bytes.
+        return bytes(self.packed_chords)
+
+    def get_fingerprint(self):
+        """
+        Returns the fingerprint of this measure, calculating it first if
+        it isn't calculated yet.
+        """
+
+        if self.fingerprint is None:
+            self.fingerprint = measure_fingerprint(
+                self.beat_schema, self.get_packed_chords()
+            )
+            Measure.objects.filter(id=self.id).update(
+                fingerprint=self.fingerprint
+            )
+
+        return self.fingerprint
+
+    def same_content(self):
+        """
+        Returns a queryset with the other measures that have the same
+        beat schema and chords relative to their key, in any chart.
+
+        Uses the index on the fingerprint.
+        """
+        return Measure.objects.filter(
+            fingerprint=self.get_fingerprint()
+        ).exclude(id=self.id)
+
     def equal_to(self, measure):
         """
         Returns a boolean indicating if the given `measure` is equal to
         this measure.
-        """
 
-        if measure.beat_schema == self.beat_schema:
+        Measures in the same key with the same fingerprint are equal.
+        Otherwise the packed chords are compared, because chords with
+        different values can still have the same notation. The chords
+        aren't loaded either way.
+        """
 
-            is_equal = True
+        if measure.beat_schema != self.beat_schema:
+            return False
 
-            for chord1, chord2 in zip(measure.chords.all(), self.chords.all()):
-                if not chord1.equal_to(chord2):
-                    is_equal = False
-                    break
+        key_id = self.line.section.key_id
+        measure_key_id = measure.line.section.key_id
 
-        else:
-            is_equal = False
+        if (
+            key_id == measure_key_id and
+            measure.get_fingerprint() == self.get_fingerprint()
+        ):
+            return True
 
-        return is_equal
+        return packed_chords_equal(
+            get_reference_data(),
+            measure_key_id, measure.get_packed_chords(),
+            key_id, self.get_packed_chords()
+        )
 
     def repeating_prev_measure(self):
         """
@@ -1157,44 +1468,53 @@ class Measure(models.Model, PermissionMixin):
         repetition sign to repeat the previous measure.
         """
 
-        chord = self.chords.all()[0]
+        chord = unpack_chords(self.get_packed_chords())[0]
+        beats = self.time_signature.beats
+        prev_measure = self.previous()
 
-        if (
-            self.previous() and
-            chord.beats == self.time_signature.beats
-        ):
+        if prev_measure and chord.beats == beats:
 
-            prev_measure_chord = self.previous().chords.all()[0]
+            prev_measure_chord = unpack_chords(
+                prev_measure.get_packed_chords()
+            )[0]
 
             if (
-                prev_measure_chord.beats == self.time_signature.beats and
-                chord.equal_to(prev_measure_chord)
+                prev_measure_chord.beats == beats and
+                chords_equal(
+                    get_reference_data(),
+                    self.line.section.key_id, chord,
+                    prev_measure.line.section.key_id, prev_measure_chord
+                )
             ):
                 return True
 
         return False
 
-    def cleanup(self):
-        """
-        Removes chords that don't fit in the `beat_schema` of this
-        measure.
-        """
-        self.chords.filter(number__gt=self.chords_count).delete()
-        if self.chords.count() == 0:
-            self.delete()
 
-
-class Chord(models.Model, PermissionMixin):
+class Chord(ChartPartMixin, models.Model, PermissionMixin):
     """
     A chord in a measure.
     """
 
+    parent_field = 'measure'
+
     measure = models.ForeignKey(
         Measure,
         related_name='chords',
         help_text="The measure this chord belongs to."
     )
 
+    chart = models.ForeignKey(
+        Chart,
+        related_name='+',
+        editable=False,
+        help_text=(
+            """The chart this chord is in. The same as the chart of the
+            measure, kept on the chord so that it can be found without
+            joins. Set automatically when the chord is created."""
+        )
+    )
+
     beats = models.PositiveSmallIntegerField(
         default=4,
         help_text=(
@@ -1280,11 +1600,14 @@ class Chord(models.Model, PermissionMixin):
 
     @property
     def owner(self):
-        return self.measure.owner
+        return self.chart.owner
 
     @property
     def chord_note_alt_notation(self):
-        return bool(self._chord_note_alt_notation and self.note.alt_name)
+        return bool(
+            self._chord_note_alt_notation and
+            get_reference_data().has_alt_name(self.key_id, self.chord_pitch)
+        )
 
     @chord_note_alt_notation.setter
     def chord_note_alt_notation(self, value):
@@ -1292,7 +1615,13 @@ class Chord(models.Model, PermissionMixin):
 
     @property
     def alt_bass_note_alt_notation(self):
-        return bool(self._alt_bass_note_alt_notation and self.alt_bass_note.alt_name)
+        return bool(
+            self._alt_bass_note_alt_notation and
+            self.alt_bass and
+            get_reference_data().has_alt_name(
+                self.key_id, self.alt_bass_pitch
+            )
+        )
 
     @alt_bass_note_alt_notation.setter
     def alt_bass_note_alt_notation(self, value):
@@ -1324,28 +1653,15 @@ class Chord(models.Model, PermissionMixin):
         - The symbol of the chord type.
         - Possibly the alternative bass note.
         """
-
-        if self.chord_note_alt_notation:
-            note_notation = self.note.alt_name
-        else:
-            note_notation = self.note.name
-
-        chord_notation = '{}{}'.format(
-            note_notation,
-            self.chord_type.chord_output
+        return get_reference_data().chord_symbol(
+            self.key_id,
+            self.chord_pitch,
+            self._chord_note_alt_notation,
+            self.chord_type_id,
+            self.alt_bass_pitch if self.alt_bass else None,
+            self._alt_bass_note_alt_notation
         )
 
-        if self.alt_bass:
-
-            if self.alt_bass_note_alt_notation:
-                alt_bass_note_notation = self.alt_bass_note.alt_name
-            else:
-                alt_bass_note_notation = self.alt_bass_note.name
-
-            chord_notation += '/{}'.format(alt_bass_note_notation)
-
-        return chord_notation
-
     @property
     def chart_output(self):
         """
@@ -1379,6 +1695,13 @@ class Chord(models.Model, PermissionMixin):
         """
         return self.measure.key
 
+    @property
+    def key_id(self):
+        """
+        The id of the key the chord is in, without loading the key.
+        """
+        return self.measure.line.section.key_id
+
     @property
     def time_signature(self):
         return self.measure.time_signature
@@ -1415,3 +1738,298 @@ class Chord(models.Model, PermissionMixin):
             return True
         else:
             return False
+
+
+class MaterializedChart(models.Model):
+    """
+    The client data of a chart, stored as JSON, so that the chart can be
+    shown with a single row instead of all its sections, lines, measures
+    and chords.
+
+    The documents are built from the revision of the chart in
+    `revision`. When the chart has a newer revision, they're built
+    again the next time they're read, see `helpers.materialized_chart`.
+    """
+
+    chart = models.OneToOneField(
+        Chart,
+        primary_key=True,
+        related_name='materialized',
+        help_text="The chart the documents are built from."
+    )
+
+    revision = models.PositiveIntegerField(
+        help_text=(
+            """The revision of the chart the documents are built from."""
+        )
+    )
+
+    document = models.TextField(
+        help_text=(
+            """The client data of the chart in its own key, as JSON."""
+        )
+    )
+
+    edit_document = models.TextField(
+        help_text=(
+            """The client data of the chart in its own key in edit mode, as
+            JSON."""
+        )
+    )
+
+
+class ProgressionGram(models.Model):
+    """
+    A progression of `GRAM_SIZE` chords in a section of a chart, in the
+    inverted index of chord progressions.
+
+    The chords are stored relative to the key of the section, so the
+    same progression in any key has the same `gram`. Every gram starts
+    at a chord and refers to the chord where the next gram starts, so a
+    progression of any length can be found by following its grams, see
+    `helpers.progressions`.
+
+    When chords change, only the grams around them are written again.
+    """
+
+    chord = models.OneToOneField(
+        Chord,
+        related_name='progression_gram',
+        help_text="The first chord of the progression."
+    )
+
+    gram = models.BigIntegerField(
+        db_index=True,
+        help_text=(
+            """The chords of the progression as one number, see
+            `progression_gram()`."""
+        )
+    )
+
+    next_chord = models.ForeignKey(
+        Chord,
+        related_name='+',
+        help_text=(
+            """The chord after the first chord of the progression, where the
+            next gram in the section starts, without rests and repeated
+            chords."""
+        )
+    )
+
+    chart = models.ForeignKey(
+        Chart,
+        related_name='+',
+        help_text="The chart the progression is in."
+    )
+
+    section = models.ForeignKey(
+        Section,
+        related_name='progression_grams',
+        help_text="The section the progression is in."
+    )
+
+    measure = models.ForeignKey(
+        Measure,
+        related_name='+',
+        help_text="The measure with the first chord of the progression."
+    )
+
+
+@receiver(post_save, sender=Chart)
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=Line)
+@receiver(post_save, sender=Measure)
+@receiver(post_save, sender=Chord)
+@receiver(post_delete, sender=Section)
+@receiver(post_delete, sender=Line)
+@receiver(post_delete, sender=Measure)
+@receiver(post_delete, sender=Chord)
+def bump_chart_revision(
+    sender, instance, signal, raw=False, created=False, **kwargs
+):
+    """
+    Bumps the revision of the chart the changed object belongs to.
+
+    Every object has the id of its chart, so this doesn't need any
+    queries to find the chart. Inside a `revision_batch()` all changes
+    result in one UPDATE.
+
+    Adding or removing objects and changing sections, lines or measures,
+    which hold the numbering and beat schemas, are structural changes
+    that make the chart need a cleanup. Changing a chord is not.
+    """
+
+    if raw:
+        return
+
+    structural = bool(
+        created or signal == post_delete or sender in (Section, Line, Measure)
+    )
+
+    if sender == Chart:
+        record_change(CHART_LOOKUP, instance.id)
+    else:
+        record_change(CHART_LOOKUP, instance.chart_id, structural)
+
+
+@receiver(pre_delete, sender=Chart)
+def start_chart_delete(sender, instance, **kwargs):
+    """
+    Stops recording changes for the chart that's being deleted, because
+    the objects in it are deleted one by one in the cascade, also when
+    the chart is deleted together with its song.
+    """
+    record_chart_delete(instance.id)
+
+
+@receiver(post_delete, sender=Chart)
+def end_chart_delete(sender, instance, **kwargs):
+    forget_chart_delete(instance.id)
+
+
+@receiver(pre_delete, sender=Measure)
+def start_measure_delete(sender, instance, **kwargs):
+    """
+    Makes sure the measure that's being deleted isn't repacked when its
+    chords are deleted in the cascade.
+    """
+    record_measure_delete(instance.id)
+
+
+@receiver(post_delete, sender=Measure)
+def end_measure_delete(sender, instance, **kwargs):
+    forget_measure_delete(instance.id)
+
+
+@receiver(post_save, sender=Measure)
+@receiver(post_save, sender=Chord)
+@receiver(post_delete, sender=Chord)
+def repack_measure(sender, instance, raw=False, **kwargs):
+    """
+    Packs the chords of the changed measure, or the measure of the
+    changed chord, again and updates its fingerprint, see
+    `Measure.packed_chords` and `Measure.fingerprint`. Measures of charts
+    that are being deleted are skipped.
+    """
+
+    if raw or chart_deleted(instance.chart_id):
+        return
+
+    if sender == Measure:
+        record_measure_change({instance.id})
+    else:
+        record_measure_change({instance.measure_id})
+
+
+@receiver(post_save, sender=Line)
+@receiver(post_save, sender=Measure)
+@receiver(post_save, sender=Chord)
+@receiver(post_delete, sender=Line)
+@receiver(post_delete, sender=Measure)
+@receiver(post_delete, sender=Chord)
+def reindex_progressions(sender, instance, raw=False, **kwargs):
+    """
+    Updates the progressions of the section of the changed chord, see
+    `ProgressionGram`.
+
+    Lines and measures hold the order of the chords and can move to
+    another section, so for them all sections of the chart are
+    compared. Nothing is done for charts that are being deleted, their
+    grams are deleted with them.
+    """
+
+    if raw or chart_deleted(instance.chart_id):
+        return
+
+    if sender == Chord:
+        record_progression_change(
+            SECTION_MEASURE_LOOKUP, {instance.measure_id}
+        )
+    else:
+        record_progression_change(SECTION_CHART_LOOKUP, {instance.chart_id})
+
+
+@receiver(pre_save, sender=Line)
+@receiver(pre_save, sender=Measure)
+@receiver(pre_save, sender=Chord)
+def set_chart(sender, instance, **kwargs):
+    """
+    Sets the chart of a new line, measure or chord, or one that moved to
+    another parent, to the chart of its parent.
+    """
+
+    parent_field = sender._meta.get_field(instance.parent_field)
+    parent_id = getattr(instance, parent_field.attname)
+
+    if not (
+        instance.chart_id is None or
+        parent_id != getattr(instance, 'loaded_parent_id', parent_id)
+    ):
+        return
+
+    # The cached parent can be an old one if only the id was changed.
+    parent = instance.__dict__.get(parent_field.get_cache_name())
+
+    if parent is not None and parent.pk == parent_id:
+        instance.chart_id = parent.chart_id
+    else:
+        instance.chart_id = (
+            parent_field.rel.to.objects.filter(id=parent_id)
+            .values_list('chart_id', flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Section)
+@receiver(post_save, sender=Line)
+@receiver(post_save, sender=Measure)
+def update_descendants_chart(sender, instance, created, raw=False, **kwargs):
+    """
+    Sets the chart of the lines, measures and chords in a section, line
+    or measure that moved to another chart, with one UPDATE per model.
+    """
+
+    loaded_chart_id = getattr(instance, 'loaded_chart_id', None)
+
+    if not (raw or created or loaded_chart_id in (None, instance.chart_id)):
+
+        if sender == Section:
+            descendants = (
+                (Line, 'section_id'),
+                (Measure, 'line__section_id'),
+                (Chord, 'measure__line__section_id')
+            )
+        elif sender == Line:
+            descendants = (
+                (Measure, 'line_id'),
+                (Chord, 'measure__line_id')
+            )
+        else:
+            descendants = ((Chord, 'measure_id'),)
+
+        for model, lookup in descendants:
+            model.objects.filter(**{lookup: instance.id}).update(
+                chart_id=instance.chart_id
+            )
+
+    instance.loaded_parent_id = getattr(
+        instance, sender._meta.get_field(instance.parent_field).attname
+    )
+    instance.loaded_chart_id = instance.chart_id
+
+
+@receiver(post_save, sender=Key)
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=ChordType)
+@receiver(post_save, sender=TimeSignature)
+@receiver(post_delete, sender=Key)
+@receiver(post_delete, sender=Note)
+@receiver(post_delete, sender=ChordType)
+@receiver(post_delete, sender=TimeSignature)
+def reload_reference_data(sender, **kwargs):
+    """
+    Makes the reference data load again in every process after a key,
+    note, chord type or time signature changed, for example in the
+    admin.
+    """
+    invalidate_reference_data()
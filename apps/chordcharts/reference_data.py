@@ -0,0 +1,328 @@
+import threading
+import time
+from collections import defaultdict
+
+from django.apps import apps
+from django.db.models import F
+
+
+# How often the reference data checks the database for changes, in
+# seconds.
+REFRESH_INTERVAL = 5
+
+_lock = threading.Lock()
+_reference_data = None
+
+
+class ReferenceData():
+    """
+    An in-memory copy of the keys, notes, chord types and time
+    signatures.
+
+    These are base data that hardly ever change, but they're needed all
+    the time when working with charts. The `ReferenceData` is loaded
+    once per process with one query per table, after which all lookups
+    are dictionary lookups without queries.
+
+    Every `REFRESH_INTERVAL` seconds, one query checks whether the
+    `ReferenceDataVersion` changed since the data was loaded. If it did,
+    the data is loaded again, so changes made in any process show up in
+    all of them.
+
+    The objects in here are shared, so they should never be changed.
+    Raises the `DoesNotExist` exception of the model when looking up an
+    object that doesn't exist, like `Model.objects.get()` would.
+    """
+
+    def __init__(self):
+
+        Key = apps.get_model('chordcharts', 'Key')
+        Note = apps.get_model('chordcharts', 'Note')
+        ChordType = apps.get_model('chordcharts', 'ChordType')
+        TimeSignature = apps.get_model('chordcharts', 'TimeSignature')
+
+        # The version is read first, so that changes made while the data
+        # is loaded are loaded again at the next check.
+        self.version = get_version()
+        self.checked = time.monotonic()
+
+        self.keys = tuple(Key.objects.all())
+        self.chord_types = tuple(ChordType.objects.all())
+        self.time_signatures = tuple(TimeSignature.objects.all())
+
+        self._keys = {}
+        self._keys_by_tonic = {}
+        self._keys_by_distance = {}
+
+        # The transposition table, with for every tonality the key at
+        # every distance from C.
+        self._transpositions = defaultdict(lambda: [None] * 12)
+
+        for key in self.keys:
+            self._keys[key.id] = key
+            self._keys_by_tonic[(key.tonic, key.tonality)] = key
+            self._keys_by_distance[(key.distance_from_c, key.tonality)] = key
+            self._transpositions[key.tonality][key.distance_from_c] = key
+
+        self._transpositions = dict(self._transpositions)
+
+        notes = defaultdict(dict)
+
+        for note in Note.objects.all():
+            notes[note.key_id][note.distance_from_root] = note
+
+        self._notes = dict(notes)
+        self._key_notes = {
+            key_id: tuple(note for _, note in sorted(key_notes.items()))
+            for key_id, key_notes in self._notes.items()
+        }
+
+        # A table with the `(name, alt_name)` of the note for every key
+        # and pitch, so that the name of a chord note is just an index.
+        self._note_names = {}
+
+        for key_id, key_notes in self._notes.items():
+            note_names = [None] * 12
+            for distance_from_root, note in key_notes.items():
+                note_names[distance_from_root] = (note.name, note.alt_name)
+            self._note_names[key_id] = note_names
+
+        # The chord symbols are formatted on first use and then kept.
+        self._chord_symbols = {}
+
+        self._chord_types = {
+            chord_type.id: chord_type for chord_type in self.chord_types
+        }
+        self._time_signatures = {}
+        self._time_signatures_by_beats = {}
+
+        for time_signature in self.time_signatures:
+            self._time_signatures[time_signature.id] = time_signature
+            self._time_signatures_by_beats[
+                (time_signature.beats, time_signature.beat_unit)
+            ] = time_signature
+
+    def key(self, key_id):
+        """
+        Returns the key with id `key_id`.
+        """
+        return self._get(self._keys, key_id, 'Key')
+
+    def key_by_tonic(self, tonic, tonality):
+        """
+        Returns the key with the given `tonic` and `tonality`.
+        """
+        return self._get(self._keys_by_tonic, (tonic, tonality), 'Key')
+
+    def key_by_distance(self, distance_from_c, tonality):
+        """
+        Returns the key with the given `distance_from_c` and `tonality`.
+        """
+        return self._get(
+            self._keys_by_distance, (distance_from_c, tonality), 'Key'
+        )
+
+    def transposed_key(self, key_id, interval):
+        """
+        Returns the key with the same tonality as the key with id
+        `key_id`, transposed `interval` half notes up.
+        """
+
+        key = self.key(key_id)
+        distance_from_c = (key.distance_from_c + interval) % 12
+        transposed_key = self._transpositions[key.tonality][distance_from_c]
+
+        if transposed_key is None:
+            return self._get({}, (distance_from_c, key.tonality), 'Key')
+
+        return transposed_key
+
+    def transpose_interval(self, key_id, tonic):
+        """
+        Returns the interval in half notes to transpose the key with id
+        `key_id` up to get a key with the given `tonic`.
+        """
+
+        Key = apps.get_model('chordcharts', 'Key')
+        tonic_key = self.key_by_tonic(tonic, Key.TONALITY_MAJOR)
+
+        return (
+            tonic_key.distance_from_c - self.key(key_id).distance_from_c
+        ) % 12
+
+    def notes(self, key_id):
+        """
+        Returns the notes of the key with id `key_id`, ordered by their
+        distance from the root.
+        """
+        return self._key_notes.get(key_id, ())
+
+    def note(self, key_id, distance_from_root):
+        """
+        Returns the note of the key with id `key_id` at
+        `distance_from_root`.
+        """
+        return self._get(
+            self._notes.get(key_id, {}), distance_from_root, 'Note'
+        )
+
+    def note_name(self, key_id, pitch, alt_notation=False):
+        """
+        Returns the name of the note of the key with id `key_id` at
+        `pitch`. If `alt_notation` is `True` and the note has an
+        alternative name, returns the alternative name.
+        """
+
+        name, alt_name = self._note_names_for(key_id, pitch)
+
+        if alt_notation and alt_name:
+            return alt_name
+        else:
+            return name
+
+    def has_alt_name(self, key_id, pitch):
+        """
+        Returns whether the note of the key with id `key_id` at `pitch`
+        has an alternative name.
+        """
+        return bool(self._note_names_for(key_id, pitch)[1])
+
+    def chord_symbol(
+        self, key_id, chord_pitch, chord_note_alt_notation, chord_type_id,
+        alt_bass_pitch=None, alt_bass_note_alt_notation=False
+    ):
+        """
+        Returns the notation of a chord, like `Chord.chord_notation`.
+
+        `alt_bass_pitch` should be `None` if the chord doesn't have an
+        alternative bass note.
+        """
+
+        lookup = (
+            key_id, chord_pitch, bool(chord_note_alt_notation),
+            chord_type_id, alt_bass_pitch, bool(alt_bass_note_alt_notation)
+        )
+        symbol = self._chord_symbols.get(lookup)
+
+        if symbol is None:
+
+            symbol = (
+                self.note_name(key_id, chord_pitch, chord_note_alt_notation) +
+                self.chord_type(chord_type_id).chord_output
+            )
+
+            if alt_bass_pitch is not None:
+                symbol += '/' + self.note_name(
+                    key_id, alt_bass_pitch, alt_bass_note_alt_notation
+                )
+
+            self._chord_symbols[lookup] = symbol
+
+        return symbol
+
+    def chord_type(self, chord_type_id):
+        """
+        Returns the chord type with id `chord_type_id`.
+        """
+        return self._get(self._chord_types, chord_type_id, 'ChordType')
+
+    def time_signature(self, time_signature_id):
+        """
+        Returns the time signature with id `time_signature_id`.
+        """
+        return self._get(
+            self._time_signatures, time_signature_id, 'TimeSignature'
+        )
+
+    def time_signature_by_beats(self, beats, beat_unit):
+        """
+        Returns the time signature with the given `beats` and
+        `beat_unit`.
+        """
+        return self._get(
+            self._time_signatures_by_beats, (beats, beat_unit),
+            'TimeSignature'
+        )
+
+    def _note_names_for(self, key_id, pitch):
+
+        note_names = self._note_names.get(key_id)
+        names = note_names[pitch] if note_names and 0 <= pitch < 12 else None
+
+        if names is None:
+            return self._get({}, (key_id, pitch), 'Note')
+
+        return names
+
+    def needs_check(self):
+        return time.monotonic() - self.checked >= REFRESH_INTERVAL
+
+    def _get(self, objects, lookup, model_name):
+
+        try:
+            return objects[lookup]
+        except KeyError:
+            model = apps.get_model('chordcharts', model_name)
+            raise model.DoesNotExist(
+                "{} matching {} does not exist.".format(model_name, lookup)
+            )
+
+
+def get_reference_data():
+    """
+    Returns the `ReferenceData` of this process, loading it if it isn't
+    loaded yet, if it was invalidated or if it changed in the database.
+    """
+
+    global _reference_data
+
+    reference_data = _reference_data
+
+    if reference_data is None:
+        with _lock:
+            if _reference_data is None:
+                _reference_data = ReferenceData()
+            reference_data = _reference_data
+    elif reference_data.needs_check():
+        with _lock:
+            if reference_data.needs_check():
+                if get_version() == reference_data.version:
+                    reference_data.checked = time.monotonic()
+                else:
+                    _reference_data = reference_data = ReferenceData()
+
+    return reference_data
+
+
+def invalidate_reference_data():
+    """
+    Makes every process load the reference data again, this process on
+    the next call to `get_reference_data()` and the other processes
+    within `REFRESH_INTERVAL` seconds.
+    """
+
+    global _reference_data
+
+    ReferenceDataVersion = apps.get_model(
+        'chordcharts', 'ReferenceDataVersion'
+    )
+
+    if not ReferenceDataVersion.objects.update(version=F('version') + 1):
+        ReferenceDataVersion.objects.create(version=1)
+
+    _reference_data = None
+
+
+def get_version():
+    """
+    Returns the current `ReferenceDataVersion`.
+    """
+
+    ReferenceDataVersion = apps.get_model(
+        'chordcharts', 'ReferenceDataVersion'
+    )
+
+    return (
+        ReferenceDataVersion.objects.values_list('version', flat=True)
+        .first() or 0
+    )
@@ -0,0 +1,254 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import BooleanField, Case, F, Q, Value, When
+from django.utils import timezone
+
+from .helpers.packed_chords import repack_measures
+from .helpers.progressions import index_progressions
+
+
+# The lookup to find a chart by its id.
+CHART_LOOKUP = 'id'
+
+# The lookups to find sections by their id, the id of their chart or
+# the id of a measure in them.
+SECTION_LOOKUP = 'id'
+SECTION_CHART_LOOKUP = 'chart_id'
+SECTION_MEASURE_LOOKUP = 'lines__measures__id'
+
+_state = threading.local()
+
+
+@contextmanager
+def revision_batch():
+    """
+    Runs the block in a transaction and bumps the revision of every
+    chart that was changed inside it once, with a single UPDATE at the
+    end of the block. The measures that changed inside it are repacked
+    and the progressions of the sections with changed chords are updated
+    once at the end as well.
+
+    Nested blocks are part of the outermost block.
+    """
+
+    if getattr(_state, 'changes', None) is not None:
+        yield
+        return
+
+    _state.changes = set()
+    _state.measure_ids = set()
+    _state.progression_changes = set()
+
+    try:
+        with transaction.atomic():
+            yield
+            repack_measures(_state.measure_ids)
+            index_progressions(get_section_ids(_state.progression_changes))
+            bump_revisions(_state.changes)
+    finally:
+        _state.changes = None
+        _state.measure_ids = None
+        _state.progression_changes = None
+        _state.deleted_chart_ids = None
+        _state.deleted_measure_ids = None
+
+
+def record_change(lookup, value, structural=False):
+    """
+    Records a change to the chart that is found with `lookup` and
+    `value`, for example `(CHART_LOOKUP, line.chart_id)`.
+
+    If `structural` is `True`, the change adds, removes or reorders
+    objects in the chart, which means the chart needs a cleanup.
+
+    Inside a `revision_batch()` the revision is bumped at the end of
+    the batch, otherwise it's bumped right away.
+    """
+
+    if lookup == CHART_LOOKUP and chart_deleted(value):
+        return
+
+    changes = getattr(_state, 'changes', None)
+
+    if changes is None:
+        bump_revisions({(lookup, value, structural)})
+    else:
+        changes.add((lookup, value, structural))
+
+
+def record_chart_delete(chart_id):
+    """
+    Records that the chart with `chart_id` is being deleted. The changes
+    to the chart and its objects in the delete cascade aren't recorded
+    after this, because there's no chart left to update, and the changes
+    that are already pending for it are dropped.
+
+    The chart is forgotten with `forget_chart_delete()` when it's
+    deleted, or at the end of the `revision_batch()`.
+    """
+
+    deleted_chart_ids = getattr(_state, 'deleted_chart_ids', None)
+
+    if deleted_chart_ids is None:
+        deleted_chart_ids = _state.deleted_chart_ids = set()
+
+    deleted_chart_ids.add(chart_id)
+
+    changes = getattr(_state, 'changes', None)
+
+    if changes:
+        changes -= {
+            change for change in changes
+            if change[0] == CHART_LOOKUP and change[1] == chart_id
+        }
+
+
+def forget_chart_delete(chart_id):
+    deleted_chart_ids = getattr(_state, 'deleted_chart_ids', None)
+    if deleted_chart_ids:
+        deleted_chart_ids.discard(chart_id)
+
+
+def chart_deleted(chart_id):
+    """
+    Returns whether the chart with `chart_id` is being deleted, see
+    `record_chart_delete()`.
+    """
+    return chart_id in (getattr(_state, 'deleted_chart_ids', None) or ())
+
+
+def record_measure_change(measure_ids):
+    """
+    Records that the chords or the beat schema of the measures with the
+    given ids changed, so that their packed chords and fingerprints are
+    built again, see `Measure.packed_chords` and `Measure.fingerprint`.
+
+    Inside a `revision_batch()` the measures are repacked at the end of
+    the batch, otherwise they're repacked right away.
+    """
+
+    measure_ids = set(measure_ids) - (
+        getattr(_state, 'deleted_measure_ids', None) or set()
+    )
+    pending_ids = getattr(_state, 'measure_ids', None)
+
+    if pending_ids is None:
+        repack_measures(measure_ids)
+    else:
+        pending_ids.update(measure_ids)
+
+
+def record_measure_delete(measure_id):
+    """
+    Records that the measure with `measure_id` is being deleted, so that
+    it isn't repacked when its chords are deleted in the cascade.
+
+    The measure is forgotten with `forget_measure_delete()` when it's
+    deleted, or at the end of the `revision_batch()`.
+    """
+
+    deleted_measure_ids = getattr(_state, 'deleted_measure_ids', None)
+
+    if deleted_measure_ids is None:
+        deleted_measure_ids = _state.deleted_measure_ids = set()
+
+    deleted_measure_ids.add(measure_id)
+
+    pending_ids = getattr(_state, 'measure_ids', None)
+
+    if pending_ids:
+        pending_ids.discard(measure_id)
+
+
+def forget_measure_delete(measure_id):
+    deleted_measure_ids = getattr(_state, 'deleted_measure_ids', None)
+    if deleted_measure_ids:
+        deleted_measure_ids.discard(measure_id)
+
+
+def record_progression_change(lookup, values):
+    """
+    Records that the chords or their order changed in the sections that
+    are found with `lookup` and any of the given `values`, for example
+    `(SECTION_MEASURE_LOOKUP, {chord.measure_id})`, so that their
+    progressions are updated, see `ProgressionGram`.
+
+    Inside a `revision_batch()` the sections are updated at the end of
+    the batch, otherwise they're updated right away.
+    """
+
+    changes = {(lookup, value) for value in values}
+    pending_changes = getattr(_state, 'progression_changes', None)
+
+    if pending_changes is None:
+        index_progressions(get_section_ids(changes))
+    else:
+        pending_changes.update(changes)
+
+
+def get_section_ids(changes):
+    """
+    Returns the ids of the sections matching the given set of
+    `(lookup, value)` changes, with one query.
+    """
+
+    if not changes:
+        return set()
+
+    Section = apps.get_model('chordcharts', 'Section')
+
+    return set(
+        Section.objects.filter(get_changes_filter(changes))
+        .values_list('id', flat=True).distinct()
+    )
+
+
+def bump_revisions(changes):
+    """
+    Bumps the revision of all charts matching the given set of
+    `(lookup, value, structural)` changes, and sets their modification
+    date to now. Charts with structural changes are marked as needing a
+    cleanup in the same UPDATE.
+    """
+
+    if not changes:
+        return
+
+    Chart = apps.get_model('chordcharts', 'Chart')
+    values = {
+        'revision': F('revision') + 1,
+        'modification_date': timezone.now()
+    }
+    structural_changes = {change for change in changes if change[2]}
+
+    if structural_changes:
+        values['needs_cleanup'] = Case(
+            When(get_changes_filter(structural_changes), then=Value(True)),
+            default=F('needs_cleanup'),
+            output_field=BooleanField()
+        )
+
+    Chart.objects.filter(get_changes_filter(changes)).update(**values)
+
+
+def get_changes_filter(changes):
+    """
+    Returns a `Q` object that matches the objects of the given changes,
+    which start with a lookup and a value.
+    """
+
+    values = defaultdict(set)
+
+    for change in changes:
+        values[change[0]].add(change[1])
+
+    filters = Q()
+
+    for lookup, lookup_values in values.items():
+        filters |= Q(**{'{}__in'.format(lookup): lookup_values})
+
+    return filters
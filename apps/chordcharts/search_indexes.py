@@ -7,7 +7,10 @@ class ChartIndex(indexes.SearchIndex, indexes.Indexable):
     text = indexes.CharField(document=True, use_template=True)
     content_auto = indexes.EdgeNgramField(model_attr='song__name')
     public = indexes.BooleanField(model_attr='public')
-    owner_id = indexes.IntegerField(model_attr='owner__id')
+    owner_id = indexes.IntegerField(model_attr='owner_id')
 
     def get_model(self):
         return Chart
+
+    def index_queryset(self, using=None):
+        return Chart.objects.select_related('song')
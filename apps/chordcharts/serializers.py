@@ -1,5 +1,32 @@
+from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import serializers
-from .models import Chart, Section, Line, Measure, Chord, ChordType, Key
+from .models import (
+    Chart, Section, Line, Measure, Chord, ChordType, Key, TimeSignature
+)
+from .reference_data import get_reference_data
+
+
+class ReferenceDataRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    A primary key related field for keys, chord types or time signatures
+    that looks up the object in the reference data instead of the
+    database.
+
+    `lookup` is the name of the `ReferenceData` method that returns the
+    object for a primary key.
+    """
+
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return getattr(get_reference_data(), self.lookup)(int(data))
+        except ObjectDoesNotExist:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 
 class CompleteDataMixin():
@@ -8,6 +35,17 @@ class CompleteDataMixin():
         self.complete_data(data)
         return super().create(data)
 
+    def complete_chart(self, data):
+        """
+        Sets the chart of the new object if the context has it. Otherwise
+        it's set to the chart of the parent when the object is saved.
+
+        Only put the chart in the context when it's sure that the parent
+        is in it.
+        """
+        if 'chart_id' in self.context:
+            data['chart_id'] = self.context['chart_id']
+
 
 class ChartSerializer(serializers.ModelSerializer):
 
@@ -24,10 +62,15 @@ class ChartSerializer(serializers.ModelSerializer):
 
 class SectionSerializer(CompleteDataMixin, serializers.ModelSerializer):
 
-    key_id = serializers.PrimaryKeyRelatedField(
+    key_id = ReferenceDataRelatedField(
+        'key',
         source='key',
         queryset=Key.objects.all()
     )
+    time_signature = ReferenceDataRelatedField(
+        'time_signature',
+        queryset=TimeSignature.objects.all()
+    )
 
     def get_key_id(self, obj):
         return obj.key.id
@@ -51,6 +94,7 @@ class LineSerializer(CompleteDataMixin, serializers.ModelSerializer):
 
     def complete_data(self, data):
         data['section_id'] = self.context['section_id']
+        self.complete_chart(data)
 
     merge_with_next_line = serializers.BooleanField()
 
@@ -63,6 +107,7 @@ class MeasureSerializer(CompleteDataMixin, serializers.ModelSerializer):
 
     def complete_data(self, data):
         data['line_id'] = self.context['line_id']
+        self.complete_chart(data)
 
     class Meta:
         model = Measure
@@ -71,7 +116,8 @@ class MeasureSerializer(CompleteDataMixin, serializers.ModelSerializer):
 
 class ChordSerializer(CompleteDataMixin, serializers.ModelSerializer):
 
-    chord_type_id = serializers.PrimaryKeyRelatedField(
+    chord_type_id = ReferenceDataRelatedField(
+        'chord_type',
         source='chord_type',
         queryset=ChordType.objects.all()
     )
@@ -81,6 +127,7 @@ class ChordSerializer(CompleteDataMixin, serializers.ModelSerializer):
 
     def complete_data(self, data):
         data['measure_id'] = self.context['measure_id']
+        self.complete_chart(data)
 
     class Meta:
         model = Chord
@@ -8,8 +8,11 @@ from .views_api import (
     ChordViewSet,
     ChartSongNameView,
     ChartTransposeView,
+    ChartOperationsView,
+    ChartDocumentView,
     SectionKeyView,
-    SearchCharts
+    SearchCharts,
+    SearchProgressions
 )
 
 charts_router = routers.SimpleRouter(trailing_slash=False)
@@ -47,6 +50,15 @@ urlpatterns = [
     url('^', include(chords_router.urls)),
     url('^chart-song-name/(?P<chart_id>\d+)/$', ChartSongNameView.as_view()),
     url('^chart-transpose/(?P<chart_id>\d+)/$', ChartTransposeView.as_view()),
+    url(
+        '^chart-operations/(?P<chart_id>\d+)/$',
+        ChartOperationsView.as_view()
+    ),
+    url(
+        '^chart-document/(?P<chart_id>\d+)/$',
+        ChartDocumentView.as_view()
+    ),
     url('^section-key/(?P<section_id>\d+)/$', SectionKeyView.as_view()),
-    url('^search/$', SearchCharts.as_view())
+    url('^search/$', SearchCharts.as_view()),
+    url('^progression-search/$', SearchProgressions.as_view())
 ]
@@ -8,16 +8,60 @@ from django.http import (
     HttpResponsePermanentRedirect, HttpResponseForbidden
 )
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 from songs.models import Song
 
-from .models import Chart, Key, ChordType
+from .models import Chart, Key
+from .reference_data import get_reference_data
+from .revisions import revision_batch
 from .forms import CreateChartForm
 from .settings import BOXED_CHART
 from .helpers.keys_json import keys_json
-from .helpers.search_charts import search_charts
+from .helpers.chart_loader import ChartLoader
+from .helpers.render_cache import get_rendered_chart
+from .helpers.materialized_chart import get_materialized_chart
+from .helpers.conditional import chart_etag, chart_last_modified
+from .helpers.search_charts import find_charts
+from .helpers.chart_pages import chart_page
 
 
+def chart_page_etag(
+    request, chart_id, song_slug=None, key_tonic=None, edit=False
+):
+    """
+    Returns the ETag for the chart page.
+
+    A chart only needs a cleanup after a structural change, which also
+    changes the revision, so the edit page can't be answered with a 304
+    while the chart needs a cleanup.
+
+    The page shows the name of the song and whether it has other charts,
+    so the song is part of the ETag too.
+    """
+    return chart_etag(
+        request, chart_id, song_slug, key_tonic, 'edit' if edit else 'view',
+        with_song=True
+    )
+
+
+def chart_page_last_modified(
+    request, chart_id, song_slug=None, key_tonic=None, edit=False
+):
+    """
+    Returns the Last-Modified date for the chart page.
+    """
+    return chart_last_modified(request, chart_id, with_song=True)
+
+
+# The page differs per user, so it may only be cached by the browser, and
+# it should always be revalidated, which is cheap thanks to the ETag.
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=chart_page_etag,
+    last_modified_func=chart_page_last_modified
+)
 def chart(request, song_slug, chart_id, key_tonic=None, edit=False):
     """
     Renders the view for the chart.
@@ -33,25 +77,34 @@ def chart(request, song_slug, chart_id, key_tonic=None, edit=False):
         """
         if key_tonic:
             try:
-                return Key.objects.get(
-                    tonic=key_tonic,
-                    tonality=chart.key.tonality
+                return get_reference_data().key_by_tonic(
+                    key_tonic, chart.key.tonality
                 )
             except ObjectDoesNotExist:
                 return None
         else:
             return None
 
-    def get_chart_data(edit, key):
+    def get_chart_data(chart, edit, key):
+        """
+        Returns the chart data and its JSON representation.
 
-        kwargs = {
-            'edit': edit
-        }
+        In the chart's own key, this comes from the materialized chart,
+        otherwise from the render cache if possible.
+        """
+
+        if not key:
+            return get_materialized_chart(chart, edit)
 
-        if key:
-            kwargs['transpose_to_tonic'] = key.tonic
+        def render():
+
+            # Render from the in-memory chart tree, so that the amount
+            # of queries doesn't depend on the size of the chart.
+            return ChartLoader(chart).client_data(
+                edit=edit, transpose_to_tonic=key.tonic
+            )
 
-        return chart.client_data(**kwargs)
+        return get_rendered_chart(chart, key, edit, render)
 
     def get_chord_types_sets(chord_types):
         """
@@ -119,19 +172,24 @@ def chart(request, song_slug, chart_id, key_tonic=None, edit=False):
             # Only clean up the chart in edit mode, because if we always
             # do it it might become a bit too much. Besides that,
             # "unclean" charts should work nevertheless.
-            chart.cleanup()
-
-        chart_data = get_chart_data(edit, key)
-        all_keys = Key.objects.all()
-        chart_keys = all_keys.filter(tonality=chart.key.tonality)
-        chord_types = ChordType.objects.all()
+            if chart.cleanup():
+                chart.refresh_from_db(fields=['revision'])
+
+        chart_data, chart_json = get_chart_data(chart, edit, key)
+        reference_data = get_reference_data()
+        all_keys = reference_data.keys
+        chart_keys = [
+            key for key in all_keys
+            if key.tonality == chart_data['key']['tonality']
+        ]
+        chord_types = reference_data.chord_types
         has_other_versions = chart.song.charts.count() > 1
 
         context = {
             'chart_settings': BOXED_CHART,
             'chart_settings_json': json.dumps(BOXED_CHART),
             'chart': chart_data,
-            'chart_json': json.dumps(chart_data),
+            'chart_json': chart_json,
             'chart_keys': chart_keys,
             'all_keys_json': keys_json(all_keys),
             'chord_types_sets': get_chord_types_sets(chord_types),
@@ -144,7 +202,15 @@ def chart(request, song_slug, chart_id, key_tonic=None, edit=False):
 
         return render(request, 'chordcharts/chart/base.html', context)
 
-    chart = get_object_or_404(Chart, id=chart_id)
+    # The materialized chart comes with the chart, but only the document
+    # for the current mode.
+    chart = get_object_or_404(
+        Chart.objects.select_related('materialized').defer(
+            'materialized__document' if edit
+            else 'materialized__edit_document'
+        ),
+        id=chart_id
+    )
     can_edit = request.user.has_perm('change', chart)
     edit = edit and can_edit
     key = get_key(chart, key_tonic)
@@ -163,30 +229,45 @@ def chart(request, song_slug, chart_id, key_tonic=None, edit=False):
 
 
 def search(request, search_term=None):
+    """
+    Shows a page of the charts that match `search_term`, of a song or of
+    a user, ordered by song name. The `after` parameter has the cursor
+    for the next page.
+    """
 
     song = request.GET.get('song')
     username = request.GET.get('user')
 
     if song:
         song = get_object_or_404(Song, id=song)
-        results = song.charts.public_or_owned(request.user)
+        charts = song.charts.public_or_owned(request.user)
     elif username:
-        results = (
+        charts = (
             Chart.objects
             .public_or_owned(request.user)
             .filter(owner__username=username)
         )
     elif search_term:
-        results = []
-        for search_result in search_charts(search_term, request.user):
-            results.append(search_result.object)
+        charts = find_charts(search_term, request.user)
     else:
-        results = Chart.objects.public_or_owned(request.user)
+        charts = Chart.objects.public_or_owned(request.user)
+
+    results, next_cursor = chart_page(
+        charts.select_related('song', 'owner'), request.GET.get('after')
+    )
+
+    if next_cursor:
+        params = request.GET.copy()
+        params['after'] = next_cursor
+        next_url = '{}?{}'.format(request.path, params.urlencode())
+    else:
+        next_url = None
 
     context = {
         'search_term': search_term,
         'username': username,
-        'results': results
+        'results': results,
+        'next_url': next_url
     }
 
     return render(request, 'chordcharts/search.html', context)
@@ -205,7 +286,7 @@ def new_chart(request):
 
         keys = {}
 
-        for key in Key.objects.all():
+        for key in get_reference_data().keys:
 
             if key.tonality not in keys:
                 keys[key.tonality] = []
@@ -239,7 +320,7 @@ def new_chart(request):
 
         context.update({
             'fields': create_chart_form.fields,
-            'all_keys_json': keys_json(Key.objects.all()),
+            'all_keys_json': keys_json(get_reference_data().keys),
             'key_select_tonics': Key.TONIC_CHOICES,
             'keys_major': keys[Key.TONALITY_MAJOR],
             'keys_minor': keys[Key.TONALITY_MINOR]
@@ -266,10 +347,13 @@ def delete_chart(request, song_slug, chart_id):
             if request.user.has_perm('delete', chart):
 
                 song = chart.song
-                chart.delete()
 
-                if song.charts.count() == 0:
-                    song.delete()
+                with revision_batch():
+
+                    chart.delete()
+
+                    if song.charts.count() == 0:
+                        song.delete()
 
                 context = {
                     'song_name': request.POST.get('song_name')
@@ -300,7 +384,7 @@ def how_to_read(request):
 def chord_symbols(request):
 
     context = {
-        'chord_types': ChordType.objects.all()
+        'chord_types': get_reference_data().chord_types
     }
 
     return render(request, 'chordcharts/chord-symbols.html', context)
@@ -1,35 +1,143 @@
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
 from django.http import HttpResponse
-from django.db import transaction
 from django.shortcuts import get_object_or_404
-from rest_framework import views, viewsets
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from rest_framework import status, views, viewsets
 from rest_framework.exceptions import ParseError, PermissionDenied
 from rest_framework.response import Response
 
 from songs.models import Song
-from users.permissions import UserPermissions
+from users.permissions import (
+    UserPermissions, get_proposed_serializer, get_proposed_obj
+)
 from .serializers import (
     ChartSerializer, SectionSerializer, LineSerializer,
     MeasureSerializer, ChordSerializer
 )
 from .models import Key, Chart, Section, Line, Measure, Chord
-from .helpers.search_charts import search_charts
+from .helpers.search_charts import autocomplete_charts, visible_filters
+from .helpers.chart_pages import chart_page
+from .helpers.progressions import find_progression
+from .helpers.conditional import chart_etag, chart_last_modified
+from .helpers.chart_operations import ChartOperations
+from .helpers.chart_document import ChartDocument
+from .helpers.materialized_chart import get_materialized_chart
+from .revisions import revision_batch
+from .reference_data import get_reference_data
+
+
+class RevisionBatchMixin():
+    """
+    Makes all changes of a write through the viewset bump the revision
+    of the chart only once.
+    """
+
+    def perform_create(self, serializer):
+        with revision_batch():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with revision_batch():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with revision_batch():
+            super().perform_destroy(instance)
+
+
+class ProposedSerializerMixin():
+    """
+    Creates objects with the serializer that `UserPermissions` already
+    validated for the permission check, instead of validating the data
+    again.
+    """
+
+    def create(self, request, *args, **kwargs):
+
+        serializer = get_proposed_serializer(self, request)
+        serializer.is_valid(raise_exception=True)
+
+        # The permission check already loaded the parent of the new
+        # object, so take the chart from there instead of loading the
+        # parent again when the object is saved.
+        obj = get_proposed_obj(self, request)
+
+        for field_name in getattr(obj, 'related_field_permissions', []):
+            chart_id = getattr(getattr(obj, field_name), 'chart_id', None)
+            if chart_id is not None:
+                serializer.context['chart_id'] = chart_id
+
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+
+        return Response(
+            serializer.data, status=status.HTTP_201_CREATED, headers=headers
+        )
+
+
+class ConditionalChartMixin():
+    """
+    Supports conditional GET requests on the chart or a part of it.
+
+    The ETag and Last-Modified are based on the revision of the chart,
+    so if the client already has the current version, a 304 is returned
+    after a single query, without loading the requested objects.
+    """
+
+    chart_lookup_url_kwarg = 'chart_pk'
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, view, request, *args, **kwargs):
+
+        chart_id = self.kwargs.get(self.chart_lookup_url_kwarg)
+
+        # Listing the charts themselves isn't about a single chart.
+        if chart_id is None:
+            return view(request, *args, **kwargs)
+
+        def etag(request, *args, **kwargs):
+            return chart_etag(request, chart_id, request.get_full_path())
+
+        def last_modified(request, *args, **kwargs):
+            return chart_last_modified(request, chart_id)
+
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+        response = conditional_view(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+
+        return response
+
+
+class ChartViewSet(
+    ConditionalChartMixin, ProposedSerializerMixin, RevisionBatchMixin,
+    viewsets.ModelViewSet
+):
 
-class ChartViewSet(viewsets.ModelViewSet):
     permission_classes = (UserPermissions,)
     serializer_class = ChartSerializer
     queryset = Chart.objects.all()
+    chart_lookup_url_kwarg = 'pk'
 
 
-class SectionViewSet(viewsets.ModelViewSet):
+class SectionViewSet(
+    ConditionalChartMixin, ProposedSerializerMixin, RevisionBatchMixin,
+    viewsets.ModelViewSet
+):
 
     permission_classes = (UserPermissions,)
     serializer_class = SectionSerializer
 
     def get_queryset(self, *args, **kwargs):
-        return Section.objects.filter(chart__id=self.kwargs['chart_pk'])
+        return Section.objects.filter(chart_id=self.kwargs['chart_pk'])
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -37,15 +145,18 @@ class SectionViewSet(viewsets.ModelViewSet):
         return context
 
 
-class LineViewSet(viewsets.ModelViewSet):
+class LineViewSet(
+    ConditionalChartMixin, ProposedSerializerMixin, RevisionBatchMixin,
+    viewsets.ModelViewSet
+):
 
     permission_classes = (UserPermissions,)
     serializer_class = LineSerializer
 
     def get_queryset(self, *args, **kwargs):
         return Line.objects.filter(
-            section__id=self.kwargs['section_pk'],
-            section__chart__id=self.kwargs['chart_pk']
+            chart_id=self.kwargs['chart_pk'],
+            section_id=self.kwargs['section_pk']
         )
 
     def get_serializer_context(self):
@@ -54,16 +165,18 @@ class LineViewSet(viewsets.ModelViewSet):
         return context
 
 
-class MeasureViewSet(viewsets.ModelViewSet):
+class MeasureViewSet(
+    ConditionalChartMixin, ProposedSerializerMixin, RevisionBatchMixin,
+    viewsets.ModelViewSet
+):
 
     permission_classes = (UserPermissions,)
     serializer_class = MeasureSerializer
 
     def get_queryset(self, *args, **kwargs):
         return Measure.objects.filter(
-            line__id=self.kwargs['line_pk'],
-            line__section__id=self.kwargs['section_pk'],
-            line__section__chart__id=self.kwargs['chart_pk']
+            chart_id=self.kwargs['chart_pk'],
+            line_id=self.kwargs['line_pk']
         )
 
     def get_serializer_context(self):
@@ -72,17 +185,18 @@ class MeasureViewSet(viewsets.ModelViewSet):
         return context
 
 
-class ChordViewSet(viewsets.ModelViewSet):
+class ChordViewSet(
+    ConditionalChartMixin, ProposedSerializerMixin, RevisionBatchMixin,
+    viewsets.ModelViewSet
+):
 
     permission_classes = (UserPermissions,)
     serializer_class = ChordSerializer
 
     def get_queryset(self, *args, **kwargs):
         return Chord.objects.filter(
-            measure__id=self.kwargs['measure_pk'],
-            measure__line__id=self.kwargs['line_pk'],
-            measure__line__section__id=self.kwargs['section_pk'],
-            measure__line__section__chart__id=self.kwargs['chart_pk']
+            chart_id=self.kwargs['chart_pk'],
+            measure_id=self.kwargs['measure_pk']
         )
 
     def get_serializer_context(self):
@@ -101,21 +215,24 @@ class ChartSongNameView(views.APIView):
     deleted.
     """
 
-    @transaction.atomic
     def post(self, request, chart_id):
 
         chart = get_object_or_404(Chart, id=chart_id)
         require_permission(request, chart, 'change')
 
-        old_song = chart.song
-        new_song = self.get_new_song(request)
-        chart.song = new_song
-        print('{} saving new song: {}'.format('-' * 25, new_song.name))
-        chart.save()
+        with revision_batch():
+
+            old_song = chart.song
+            new_song = self.get_new_song(request)
+            chart.song = new_song
+            print('{} saving new song: {}'.format('-' * 25, new_song.name))
+            chart.save()
 
-        if old_song.charts.count() == 0:
-            print('{} deleting old song: {}'.format('-' * 25, old_song.name))
-            old_song.delete()
+            if old_song.charts.count() == 0:
+                print('{} deleting old song: {}'.format(
+                    '-' * 25, old_song.name
+                ))
+                old_song.delete()
 
         return Response({})
 
@@ -150,9 +267,8 @@ class ChartTransposeView(views.APIView):
         require_permission(request, chart, 'change')
 
         try:
-            key = Key.objects.get(
-                tonic=request.data.get('tonic'),
-                tonality=1
+            key = get_reference_data().key_by_tonic(
+                request.data.get('tonic'), Key.TONALITY_MAJOR
             )
         except ObjectDoesNotExist:
             raise ParseError('Invalid key')
@@ -162,6 +278,80 @@ class ChartTransposeView(views.APIView):
         return Response({})
 
 
+class ChartOperationsView(views.APIView):
+    """
+    Apply a list of create, update and delete operations on the
+    sections, lines, measures and chords of a chart.
+
+    The operations are applied in one transaction, see `ChartOperations`
+    for their format. Returns the ids of the created objects by their
+    `ref`, the result of each operation and the new revision of the
+    chart.
+    """
+
+    def post(self, request, chart_id):
+
+        chart = get_object_or_404(Chart, id=chart_id)
+        require_permission(request, chart, 'change')
+
+        operations = request.data.get('operations')
+
+        if not isinstance(operations, list):
+            raise ParseError('No operations given')
+
+        chart_operations = ChartOperations(chart, operations)
+        chart_operations.apply()
+
+        return Response({
+            'ids': chart_operations.ids,
+            'results': chart_operations.results,
+            'revision': chart.revision
+        })
+
+
+class ChartDocumentView(views.APIView):
+    """
+    Get or replace the complete chart document, in the shape of
+    `Chart.client_data()`.
+
+    A GET returns the materialized chart document, which is fetched
+    together with the chart.
+
+    A PUT replaces the sections, lines, measures and chords of the chart
+    with the given document. Only the differences with the stored chart
+    are written, see `ChartDocument`. The document should be in the
+    shape of the edit document that the GET returns; a view document
+    without the repeated measures is rejected. Returns the new chart
+    document, with the ids of the created objects.
+    """
+
+    def get(self, request, chart_id):
+
+        chart = get_object_or_404(
+            Chart.objects.select_related('materialized')
+            .defer('materialized__document'),
+            id=chart_id
+        )
+        require_permission(request, chart, 'read')
+
+        _, chart_json = get_materialized_chart(chart, True)
+
+        # The document is already JSON, so it doesn't have to go through
+        # the renderer.
+        return HttpResponse(chart_json, content_type='application/json')
+
+    def put(self, request, chart_id):
+
+        chart = get_object_or_404(Chart, id=chart_id)
+        require_permission(request, chart, 'change')
+
+        ChartDocument(chart, request.data).apply()
+
+        chart_data, _ = get_materialized_chart(chart, True)
+
+        return Response(chart_data)
+
+
 class SectionKeyView(views.APIView):
     """
     View to update the section key without transposing the chords.
@@ -184,9 +374,8 @@ class SectionKeyView(views.APIView):
             raise ParseError('Invalid tonality. Choose "major" or "minor".')
 
         try:
-            key = Key.objects.get(
-                tonic=request.data.get('tonic'),
-                tonality=tonality
+            key = get_reference_data().key_by_tonic(
+                request.data.get('tonic'), tonality
             )
         except ObjectDoesNotExist:
             raise ParseError('Invalid key')
@@ -204,21 +393,30 @@ class SearchCharts(views.APIView):
     def post(self, request):
 
         search_term = request.POST.get('search_term')
-        search_results = search_charts(search_term, request.user)
+        search_results, next_cursor = autocomplete_charts(
+            search_term, request.user, request.POST.get('after')
+        )
         songs = {}
 
+        # The results are made from one query for the fields needed, so
+        # the charts aren't loaded.
         for search_result in search_results:
 
-            chart = search_result.object
-
-            if chart.song.id in songs:
-                songs[chart.song.id].append(chart)
+            if search_result.song_id in songs:
+                songs[search_result.song_id].append(search_result)
             else:
-                songs[chart.song.id] = [chart]
+                songs[search_result.song_id] = [search_result]
 
-        return Response({'results': self.get_results(songs)})
+        return Response({
+            'results': self.get_results(songs),
+            'next': next_cursor
+        })
 
     def get_results(self, songs):
+        """
+        Returns the results for the given dict with the search results
+        of the charts of every song.
+        """
 
         results_dict = []
 
@@ -233,7 +431,7 @@ class SearchCharts(views.APIView):
 
             elif len(charts) > 1:
                 results_dict.append(
-                    self.get_song_result(charts[0].song)
+                    self.get_song_result(charts[0])
                 )
             else:
                 results_dict.append(
@@ -242,39 +440,150 @@ class SearchCharts(views.APIView):
 
         return results_dict
 
-    def get_chart_result(self, chart):
+    def get_chart_result(self, search_result):
 
-        song = chart.song
         url = reverse(
             'chordcharts:chart',
             kwargs={
-                'chart_id': chart.id,
-                'song_slug': song.slug
+                'chart_id': search_result.pk,
+                'song_slug': search_result.song_slug
             }
         )
 
         return {
             'url': url,
-            'song_name': song.name,
-            'short_description': chart.short_description
+            'song_name': search_result.song_name,
+            'short_description': search_result.short_description
         }
 
-    def get_song_result(self, song):
+    def get_song_result(self, search_result):
 
         url = reverse(
             'search',
             kwargs={
-                'search_term': song.name
+                'search_term': search_result.song_name
             }
         )
 
         return {
             'url': url,
-            'song_name': song.name,
+            'song_name': search_result.song_name,
             'short_description': ''
         }
 
 
+class SearchProgressions(views.APIView):
+    """
+    View to search for charts with a chord progression, in any key.
+
+    Expects a JSON object with a list of `chords`, each with a
+    `chord_pitch` relative to the key and a `chord_type_id`, like in
+    the chords API. Returns a page of the charts with the progression,
+    ordered by song name, with the positions of the measures where the
+    progression starts. The `after` cursor gives the next page, see
+    `chart_page()`.
+    """
+
+    def post(self, request):
+
+        try:
+            matches = find_progression(self.get_chords(request.data))
+        except ValueError as error:
+            raise ParseError(str(error))
+
+        charts, next_cursor = chart_page(
+            Chart.objects.filter(
+                visible_filters(request.user),
+                id__in=matches.values('chart_id')
+            ).values_list(
+                'song__name', 'id', 'song__slug', 'short_description'
+            ),
+            request.data.get('after')
+        )
+
+        return Response({
+            'results': self.get_results(charts, matches),
+            'next': next_cursor
+        })
+
+    def get_chords(self, data):
+        """
+        Returns the `(chord_pitch, chord_type_id)` of the chords in
+        `data`.
+        """
+
+        chords = data.get('chords')
+
+        if not isinstance(chords, list):
+            raise ParseError('Invalid chords')
+
+        try:
+            chords = [
+                (int(chord['chord_pitch']), int(chord['chord_type_id']))
+                for chord in chords
+            ]
+        except (TypeError, KeyError, ValueError):
+            raise ParseError('Invalid chords')
+
+        reference_data = get_reference_data()
+
+        for chord_pitch, chord_type_id in chords:
+
+            if not 0 <= chord_pitch < 12:
+                raise ParseError('Invalid chord pitch')
+
+            try:
+                reference_data.chord_type(chord_type_id)
+            except ObjectDoesNotExist:
+                raise ParseError('Invalid chord type')
+
+        return chords
+
+    def get_results(self, charts, matches):
+        """
+        Returns the results for the given page of charts, with the
+        positions of the `matches` in them, loaded with one query.
+        """
+
+        positions = {chart_id: [] for _, chart_id, _, _ in charts}
+
+        for chart_id, section, line, measure in (
+            matches.filter(chart_id__in=positions).order_by(
+                'chart_id', 'section__number', 'measure__line__number',
+                'measure__number', 'chord__number'
+            ).values_list(
+                'chart_id', 'section__number', 'measure__line__number',
+                'measure__number'
+            )
+        ):
+            positions[chart_id].append({
+                'section': section,
+                'line': line,
+                'measure': measure
+            })
+
+        results_dict = []
+
+        for song_name, chart_id, song_slug, short_description in charts:
+
+            url = reverse(
+                'chordcharts:chart',
+                kwargs={
+                    'chart_id': chart_id,
+                    'song_slug': song_slug
+                }
+            )
+
+            results_dict.append({
+                'url': url,
+                'song_name': song_name,
+                'short_description': short_description,
+                'positions': positions[chart_id]
+            })
+
+        return results_dict
+
+
 def require_permission(request, obj, permission):
     if not request.user.has_perm(permission, obj):
         raise PermissionDenied()
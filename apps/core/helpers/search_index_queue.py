@@ -0,0 +1,136 @@
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import models
+from haystack import connections, connection_router
+from haystack.signals import BaseSignalProcessor
+from haystack.utils import get_model_ct
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Signal processor that doesn't update the search index right away,
+    but adds the saved and deleted objects to a queue in the database.
+
+    This keeps the search backend out of the request. The queue is
+    processed with `process_queue()`, usually with the
+    `process_search_index_queue` command.
+
+    This is loaded when Haystack is imported, before the models are, so
+    the models are only looked up when a signal comes in.
+    """
+
+    def setup(self):
+        self.indexed_models = None
+        models.signals.post_save.connect(self.handle_save)
+        models.signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save)
+        models.signals.post_delete.disconnect(self.handle_delete)
+
+    def handle_save(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance)
+
+    def enqueue(self, sender, instance):
+        if sender in self.get_indexed_models():
+            enqueue(sender, [instance.pk])
+
+    def get_indexed_models(self):
+        """
+        Returns the set of models that have a search index in any of the
+        connections.
+        """
+
+        if self.indexed_models is None:
+
+            self.indexed_models = set()
+
+            for connection in self.connections.all():
+                self.indexed_models.update(
+                    connection.get_unified_index().get_indexed_models()
+                )
+
+        return self.indexed_models
+
+
+def enqueue(model, ids):
+    """
+    Adds the objects of `model` with the given `ids` to the queue, so
+    that they're updated in the search index.
+    """
+
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchIndexUpdate = apps.get_model('core', 'SearchIndexUpdate')
+    content_type = ContentType.objects.get_for_model(model)
+
+    SearchIndexUpdate.objects.bulk_create([
+        SearchIndexUpdate(content_type=content_type, object_id=object_id)
+        for object_id in ids
+    ])
+
+
+def process_queue(batch_size=100):
+    """
+    Processes the oldest `batch_size` updates in the queue and returns
+    the amount of updates processed.
+
+    Every object is updated once, however often it's in the batch, and
+    the objects of every model are loaded and sent to the search backend
+    together. Objects that don't exist anymore are removed from the
+    index. The updates are only removed from the queue when the index
+    is updated, so if the backend fails they're processed again later.
+    """
+
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    SearchIndexUpdate = apps.get_model('core', 'SearchIndexUpdate')
+
+    updates = list(
+        SearchIndexUpdate.objects.order_by('id')
+        .values_list('id', 'content_type_id', 'object_id')[:batch_size]
+    )
+
+    if not updates:
+        return 0
+
+    object_ids = defaultdict(set)
+
+    for _, content_type_id, object_id in updates:
+        object_ids[content_type_id].add(object_id)
+
+    for content_type_id, ids in object_ids.items():
+        update_objects(
+            ContentType.objects.get_for_id(content_type_id).model_class(),
+            ids
+        )
+
+    SearchIndexUpdate.objects.filter(
+        id__in=[update_id for update_id, _, _ in updates]
+    ).delete()
+
+    return len(updates)
+
+
+def update_objects(model, ids):
+    """
+    Updates the objects of `model` with the given `ids` in the search
+    index of every connection, or removes them if they don't exist
+    anymore.
+    """
+
+    for using in connection_router.for_write():
+
+        connection = connections[using]
+        index = connection.get_unified_index().get_index(model)
+        backend = connection.get_backend()
+
+        objects = list(index.index_queryset(using=using).filter(pk__in=ids))
+
+        if objects:
+            backend.update(index, objects)
+
+        for object_id in ids - {obj.pk for obj in objects}:
+            backend.remove('{}.{}'.format(get_model_ct(model), object_id))
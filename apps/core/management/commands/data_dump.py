@@ -16,5 +16,6 @@ class Command(BaseCommand):
                 'chordcharts',
                 'songs',
                 'users',
+                exclude=['chordcharts.MaterializedChart'],
                 stdout=output_file
             )
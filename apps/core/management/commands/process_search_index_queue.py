@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.helpers.search_index_queue import process_queue
+
+
+class Command(BaseCommand):
+
+    help = (
+        "Updates the search index with the objects that were saved or "
+        "deleted since the last run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=100,
+            help="The amount of queued updates to process at once."
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            dest='interval',
+            default=None,
+            help=(
+                "Keep running and check the queue again every this many "
+                "seconds."
+            )
+        )
+
+    def handle(self, *args, **options):
+
+        while True:
+
+            count = 0
+
+            while True:
+
+                processed = process_queue(options['batch_size'])
+
+                if not processed:
+                    break
+
+                count += processed
+
+            if count:
+                self.stdout.write("Processed {} updates.".format(count))
+
+            if options['interval'] is None:
+                break
+
+            time.sleep(options['interval'])
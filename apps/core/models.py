@@ -0,0 +1,26 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class SearchIndexUpdate(models.Model):
+    """
+    An object that has to be updated in (or removed from) the search
+    index.
+
+    Saving or deleting an indexed object adds one of these, see
+    `core.helpers.search_index_queue`. They're processed in batches
+    with the `process_search_index_queue` command.
+    """
+
+    content_type = models.ForeignKey(
+        ContentType,
+        related_name='+',
+        help_text="The model of the object."
+    )
+
+    object_id = models.PositiveIntegerField(
+        help_text="The id of the object."
+    )
+
+    def __str__(self):
+        return "{} {}".format(self.content_type, self.object_id)
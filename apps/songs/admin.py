@@ -1,5 +1,6 @@
 from django.contrib import admin
 from chordcharts.models import Chart
+from chordcharts.admin import RevisionBatchAdminMixin
 from .models import Song
 
 
@@ -7,7 +8,7 @@ class ChartInline(admin.StackedInline):
     model = Chart
     extra = 0
 
-class SongAdmin(admin.ModelAdmin):
+class SongAdmin(RevisionBatchAdminMixin, admin.ModelAdmin):
     inlines = (ChartInline,)
 
 
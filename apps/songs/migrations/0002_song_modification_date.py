@@ -0,0 +1,21 @@
+# encoding: utf8
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('songs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='modification_date',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, help_text='\n            When the song was last saved. Used by the song name index of\n            every process to find the songs that changed.\n        '),
+            preserve_default=False,
+        ),
+    ]
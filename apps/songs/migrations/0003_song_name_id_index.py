@@ -0,0 +1,18 @@
+# encoding: utf8
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('songs', '0002_song_modification_date'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='song',
+            index_together=set([('name', 'id')]),
+        ),
+    ]
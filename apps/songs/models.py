@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from autoslug import AutoSlugField
 
+from .song_names import expire_song_name_index
+
 
 class Song(models.Model):
 
@@ -10,12 +14,22 @@ class Song(models.Model):
         always_update=True,
         max_length=150
     )
+    modification_date = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        help_text=("""
+            When the song was last saved. Used by the song name index of
+            every process to find the songs that changed.
+        """)
+    )
 
     def __str__(self):
         return self.name
 
     class Meta():
         ordering = ['name']
+        # For the pages of charts, which are ordered by song name and id.
+        index_together = [['name', 'id']]
 
     def client_data(self):
         return {
@@ -23,3 +37,14 @@ class Song(models.Model):
             'name': self.name,
             'slug': self.slug
         }
+
+
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def refresh_song_names(sender, **kwargs):
+    """
+    Makes the song name index of this process pick up the change right
+    away, so that a song shows up in the autocomplete right after it's
+    created.
+    """
+    expire_song_name_index()
@@ -7,5 +7,9 @@ class SongIndex(indexes.SearchIndex, indexes.Indexable):
     text = indexes.CharField(document=True, use_template=True)
     content_auto = indexes.EdgeNgramField(model_attr='name')
 
+    # Stored only, so that search results can be shown without loading
+    # the songs.
+    name = indexes.CharField(model_attr='name', indexed=False)
+
     def get_model(self):
         return Song
@@ -0,0 +1,191 @@
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+from django.apps import apps
+
+
+# How often the index checks the database for changed songs, in
+# seconds.
+REFRESH_INTERVAL = 5
+
+_lock = threading.Lock()
+_song_name_index = None
+
+
+class SongNameIndex():
+    """
+    An in-memory prefix index on the words in the names of all songs.
+
+    Finds the songs that have a word starting with every word of a
+    search term, like the `content_auto` field of `SongIndex` does in
+    the search backend. The words are kept in a sorted list, so a search
+    is a binary search per word, without queries.
+
+    The index is built once per process. After that, it's refreshed
+    every `REFRESH_INTERVAL` seconds with one query for the songs that
+    changed since the last refresh (see `Song.modification_date`) and
+    one to count the songs. If the count doesn't match, songs were
+    deleted and the index is built again.
+    """
+
+    def __init__(self):
+        self.build()
+
+    def build(self):
+
+        Song = apps.get_model('songs', 'Song')
+
+        self.names = {}
+        self.words = []
+        self.modified_since = None
+
+        for song_id, name, modification_date in (
+            Song.objects.values_list('id', 'name', 'modification_date')
+        ):
+            self.names[song_id] = name
+            self.words.extend(
+                (word, song_id) for word in normalize_words(name)
+            )
+            self.update_modified_since(modification_date)
+
+        self.words.sort()
+        self.refreshed = time.monotonic()
+
+    def refresh(self):
+        """
+        Applies the changes to the songs since the last refresh.
+        """
+
+        Song = apps.get_model('songs', 'Song')
+        changed_songs = Song.objects.values_list(
+            'id', 'name', 'modification_date'
+        )
+
+        # Songs saved in the same moment as the last change could be
+        # committed after the last refresh, so they're checked again.
+        if self.modified_since:
+            changed_songs = changed_songs.filter(
+                modification_date__gte=self.modified_since
+            )
+
+        for song_id, name, modification_date in changed_songs:
+            self.remove_song(song_id)
+            self.add_song(song_id, name)
+            self.update_modified_since(modification_date)
+
+        if Song.objects.count() != len(self.names):
+            self.build()
+
+        self.refreshed = time.monotonic()
+
+    def needs_refresh(self):
+        return time.monotonic() - self.refreshed >= REFRESH_INTERVAL
+
+    def expire(self):
+        """
+        Makes the index refresh on the next `get_song_name_index()`.
+        """
+        self.refreshed = 0
+
+    def add_song(self, song_id, name):
+
+        self.names[song_id] = name
+
+        for word in normalize_words(name):
+            bisect.insort(self.words, (word, song_id))
+
+    def remove_song(self, song_id):
+
+        name = self.names.pop(song_id, None)
+
+        if name is None:
+            return
+
+        for word in normalize_words(name):
+            index = bisect.bisect_left(self.words, (word, song_id))
+            if self.words[index:index + 1] == [(word, song_id)]:
+                del self.words[index]
+
+    def update_modified_since(self, modification_date):
+        if not self.modified_since or modification_date > self.modified_since:
+            self.modified_since = modification_date
+
+    def search(self, search_term):
+        """
+        Returns a list with the `(id, name)` of every song that matches
+        `search_term`, ordered by name.
+        """
+
+        song_ids = None
+
+        for prefix in normalize_words(search_term):
+
+            start = bisect.bisect_left(self.words, (prefix,))
+            end = bisect.bisect_left(self.words, (prefix + '￿',))
+            prefix_ids = {song_id for _, song_id in self.words[start:end]}
+
+            if song_ids is None:
+                song_ids = prefix_ids
+            else:
+                song_ids &= prefix_ids
+
+            if not song_ids:
+                return []
+
+        if song_ids is None:
+            return []
+
+        return sorted(
+            ((song_id, self.names[song_id]) for song_id in song_ids),
+            key=lambda song: (song[1], song[0])
+        )
+
+
+def normalize_words(text):
+    """
+    Returns the words in `text`, in lowercase and without accents.
+    """
+
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+
+    return re.findall(r'\w+', text.lower())
+
+
+def get_song_name_index():
+    """
+    Returns the `SongNameIndex` of this process, building it if it isn't
+    built yet and refreshing it if it's time to.
+    """
+
+    global _song_name_index
+
+    song_name_index = _song_name_index
+
+    if song_name_index is None:
+        with _lock:
+            if _song_name_index is None:
+                _song_name_index = SongNameIndex()
+            song_name_index = _song_name_index
+    elif song_name_index.needs_refresh():
+        with _lock:
+            if song_name_index.needs_refresh():
+                song_name_index.refresh()
+
+    return song_name_index
+
+
+def expire_song_name_index():
+    """
+    Makes the next call to `get_song_name_index()` refresh the index of
+    this process, if it's built. Other processes pick up the changes
+    within `REFRESH_INTERVAL` seconds.
+    """
+
+    song_name_index = _song_name_index
+
+    if song_name_index is not None:
+        song_name_index.expire()
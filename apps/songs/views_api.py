@@ -2,6 +2,7 @@ from rest_framework import views
 from rest_framework.response import Response
 from haystack.query import SearchQuerySet
 from .models import Song
+from .song_names import get_song_name_index
 
 
 class SearchSongs(views.APIView):
@@ -12,14 +13,21 @@ class SearchSongs(views.APIView):
     def post(self, request):
 
         search_term = request.POST.get('search_term')
-        search_results = SearchQuerySet().models(Song).autocomplete(
-            content_auto=search_term
-        )
+        names = [name for _, name in get_song_name_index().search(search_term)]
+
+        # Only search terms that don't match the start of the words in a
+        # song name go to the search index.
+        if not names:
+            search_results = SearchQuerySet().models(Song).autocomplete(
+                content_auto=search_term
+            )
+            names = [search_result.name for search_result in search_results]
+
         results_dict = []
 
-        for search_result in search_results:
+        for name in names:
             results_dict.append({
-                'name': search_result.object.name
+                'name': name
             })
 
         return Response({'results': results_dict})
@@ -1,10 +1,15 @@
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.contrib.auth.backends import ModelBackend
-from chordcharts.models import Chart
+from chordcharts.models import (
+    Chart, Section, Line, Measure, Chord, get_chart_owner_id
+)
 from .models import User
 
 
+CHART_OWNER_PERMISSIONS = frozenset(('read', 'change', 'delete'))
+
+
 class UserBackend(ModelBackend):
 
     def authenticate(
@@ -49,11 +54,21 @@ class UserBackend(ModelBackend):
 
     def has_perm(self, user_obj, perm, obj=None):
         """
-        If `obj` is not None, it will check if the user has permission
-        for this specific object by calling the `has_permission` method
-        on that object if it's there. Otherwise, will do the default
-        behavior
+        If `obj` is a chart or an object in a chart, checks the
+        permissions the user has for that chart, see
+        `get_chart_permissions()`.
+
+        If `obj` is another object, it will check if the user has
+        permission for this specific object by calling the
+        `has_permission` method on that object if it's there. Otherwise,
+        will do the default behavior
         """
+
+        chart_id = get_chart_id(obj)
+
+        if chart_id is not None:
+            return perm in self.get_chart_permissions(user_obj, obj, chart_id)
+
         if (
             obj and hasattr(obj, 'has_permission') and
             obj.has_permission(user_obj, perm)
@@ -61,3 +76,46 @@ class UserBackend(ModelBackend):
             return True
         else:
             return super().has_perm(user_obj, perm, obj)
+
+    def get_chart_permissions(self, user_obj, obj, chart_id):
+        """
+        Returns the set of permissions the user has for the chart with
+        id `chart_id`, which `obj` is or is in.
+
+        The owner of a chart has all permissions for it. The owner is
+        found with `get_chart_owner_id()`, with at most one query per
+        chart, and the permissions are kept on `user_obj`, which lives
+        as long as the request, so checking more objects of the same
+        chart doesn't need queries.
+        """
+
+        if user_obj.pk is None:
+            return frozenset()
+
+        if not hasattr(user_obj, '_chart_permissions'):
+            user_obj._chart_permissions = {}
+
+        permissions = user_obj._chart_permissions.get(chart_id)
+
+        if permissions is None:
+
+            if get_chart_owner_id(user_obj, obj) == user_obj.pk:
+                permissions = CHART_OWNER_PERMISSIONS
+            else:
+                permissions = frozenset()
+
+            user_obj._chart_permissions[chart_id] = permissions
+
+        return permissions
+
+
+def get_chart_id(obj):
+    """
+    Returns the id of the chart if `obj` is a saved chart or an object
+    in a chart, otherwise `None`.
+    """
+
+    if isinstance(obj, Chart):
+        return obj.id
+    elif isinstance(obj, (Section, Line, Measure, Chord)):
+        return obj.chart_id
@@ -51,7 +51,7 @@ def has_related_field_permissions(view, request):
             field_class = obj._meta.get_field_by_name(field_name)[0]
 
             if isinstance(field_class, models.ForeignKey):
-                allowed = field.has_permission(request.user, 'change')
+                allowed = request.user.has_perm('change', field)
             else:
                 raise Exception(
                     "Related field type `{}` not supported for "
@@ -63,13 +63,43 @@ def has_related_field_permissions(view, request):
 
     return allowed
 
+
 def get_proposed_obj(view, request):
     """
     Returns the object that the request is proposing to create, or
     `None` if the data isn't valid or the view has no `model`.
+
+    The object is kept on the request, so the related objects that are
+    loaded for the permission check can be used by the view as well.
+    """
+
+    if not hasattr(request, '_proposed_obj'):
+
+        serializer = get_proposed_serializer(view, request)
+        request._proposed_obj = None
+
+        if serializer.is_valid() and hasattr(serializer.Meta, 'model'):
+            data = copy(serializer.validated_data)
+            serializer.complete_data(data)
+            request._proposed_obj = serializer.Meta.model(**data)
+
+    return request._proposed_obj
+
+
+def get_proposed_serializer(view, request):
+    """
+    Returns the serializer of the view with the data of the request, on
+    which `is_valid()` has been called.
+
+    The serializer is kept on the request, so that the permission check
+    and the view that creates the object validate the data only once.
     """
-    serializer = view.get_serializer(data=request.data)
-    if serializer.is_valid() and hasattr(serializer.Meta, 'model'):
-        data = copy(serializer.validated_data)
-        serializer.complete_data(data)
-        return serializer.Meta.model(**data)
+
+    serializer = getattr(request, '_proposed_serializer', None)
+
+    if serializer is None:
+        serializer = view.get_serializer(data=request.data)
+        serializer.is_valid()
+        request._proposed_serializer = serializer
+
+    return serializer
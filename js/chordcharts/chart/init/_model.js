@@ -1,18 +1,44 @@
+var syncQueue = require('./_sync-queue.js');
+
+
 module.exports = Backbone.Model.extend({
 
-    sync: function() {
+    /**
+     * The name of the model in the chart operations API. Models that
+     * have one are saved through the sync queue, in batches.
+     */
+    syncModelName: null,
 
-        return Backbone.sync.apply(this, arguments).fail(function() {
+    /**
+     * Returns the parent model in the chart operations API, or `null`
+     * if the model is created directly in the chart.
+     */
+    syncParent: function() {
+        return null;
+    },
 
-            if (confirm(
-                'A problem occured while synchronizing your changes to ' +
-                'the server. Please refresh the page and try again.'
-            )) {
-                location.reload();
-            }
+    sync: function(method, model, options) {
 
+        if (this.syncModelName && method != 'read') {
+            return syncQueue.sync(method, model, options);
+        }
+
+        return Backbone.sync.apply(this, arguments).fail(function() {
+            syncQueue.error();
         });
 
+    },
+
+    destroy: function() {
+
+        // Backbone doesn't sync new models when they're destroyed, but
+        // their create might still be waiting in the sync queue.
+        if (this.syncModelName && this.isNew()) {
+            syncQueue.discard(this);
+        }
+
+        return Backbone.Model.prototype.destroy.apply(this, arguments);
+
     }
 
 });
@@ -0,0 +1,330 @@
+/**
+ * Queue that collects the changes to the sections, lines, measures and
+ * chords of a chart and sends them to the server in batches.
+ *
+ * Changes are sent `delay` milliseconds after the last change, so that
+ * quick successive edits end up in one request. Multiple changes to the
+ * same model are merged into one operation, with the data the model has
+ * when the batch is sent. There's never more than one request at a
+ * time, changes made while a request is running are sent after it.
+ */
+var SyncQueue = function(url, delay) {
+
+    this.url = url;
+    this.delay = delay;
+
+    // The pending changes in the order they were made, with for every
+    // model the method, the model and the `options` and deferreds of
+    // the syncs that are waiting for it.
+    this.pending = [];
+    this.sending = null;
+    this.timeout = null;
+    this.in_flight = false;
+
+};
+
+/**
+ * Adds a sync of `model` with `method` to the queue and returns a
+ * promise that's resolved when the change is saved on the server.
+ *
+ * The model should have a `syncModelName` and a `syncParent()` method
+ * that returns its parent model, or `null` for sections.
+ */
+SyncQueue.prototype.sync = function(method, model, options) {
+
+    var deferred = $.Deferred();
+    var change = this.find(model);
+
+    if (method == 'delete') {
+
+        if (change) {
+            this.pending.splice(this.pending.indexOf(change), 1);
+        }
+
+        // Deletes go to the end, so that earlier changes to the
+        // children of the model can still be applied.
+        change = this.add(method, model, change);
+
+    } else if (!change) {
+        change = this.add(method, model);
+    }
+
+    change.waiting.push({ options: options, deferred: deferred });
+    this.schedule();
+
+    return deferred.promise();
+
+};
+
+/**
+ * Drops the pending changes of the new `model` and the models inside
+ * it, because it's destroyed before it was saved. If it's being
+ * created right now, it's deleted again afterwards.
+ */
+SyncQueue.prototype.discard = function(model) {
+
+    var that = this;
+
+    this.pending = _.filter(this.pending, function(change) {
+
+        if (that.isInside(change.model, model)) {
+            that.resolve(change, {});
+            return false;
+        }
+
+        return true;
+
+    });
+
+    if (this.isSending(model)) {
+        this.add('delete', model);
+        this.schedule();
+    }
+
+};
+
+/**
+ * Returns whether `model` is `ancestor` or one of its descendants.
+ */
+SyncQueue.prototype.isInside = function(model, ancestor) {
+
+    while (model) {
+
+        if (model === ancestor) {
+            return true;
+        }
+
+        model = model.syncParent();
+
+    }
+
+    return false;
+
+};
+
+SyncQueue.prototype.find = function(model) {
+    return _.find(this.pending, function(change) {
+        return change.model === model;
+    });
+};
+
+SyncQueue.prototype.add = function(method, model, previous) {
+
+    var change = {
+        method: method,
+        model: model,
+        waiting: previous ? previous.waiting : []
+    };
+
+    this.pending.push(change);
+
+    return change;
+
+};
+
+/**
+ * Returns whether the create of `model` is in the running request.
+ */
+SyncQueue.prototype.isSending = function(model) {
+    return _.some(this.sending, function(change) {
+        return change.model === model;
+    });
+};
+
+SyncQueue.prototype.schedule = function() {
+
+    var that = this;
+
+    clearTimeout(this.timeout);
+
+    this.timeout = setTimeout(function() {
+        that.flush();
+    }, this.delay);
+
+};
+
+/**
+ * Sends all pending changes in one request, unless there's already a
+ * request running, in which case they're sent when it's done.
+ */
+SyncQueue.prototype.flush = function() {
+
+    var that = this;
+
+    clearTimeout(this.timeout);
+
+    if (this.in_flight || !this.pending.length) {
+        return;
+    }
+
+    // Changes to models that are still waiting for their parent to
+    // be created have to wait for the next batch.
+    this.sending = [];
+    var waiting = [];
+
+    _.each(this.pending, function(change) {
+        if (that.canSend(change)) {
+            that.sending.push(change);
+        } else {
+            waiting.push(change);
+        }
+    });
+
+    this.pending = waiting;
+
+    if (!this.sending.length) {
+        this.sending = null;
+        return;
+    }
+
+    this.in_flight = true;
+
+    $.ajax({
+        url: this.url,
+        type: 'POST',
+        contentType: 'application/json',
+        data: JSON.stringify({
+            operations: _.map(this.sending, function(change) {
+                return that.operation(change);
+            })
+        })
+    }).done(function(response) {
+
+        _.each(that.sending, function(change, index) {
+            that.resolve(change, response.results[index]);
+        });
+
+    }).fail(function(xhr, text_status, error) {
+
+        _.each(that.sending, function(change) {
+            _.each(change.waiting, function(sync) {
+                if (sync.options.error) {
+                    sync.options.error(xhr, text_status, error);
+                }
+                sync.deferred.reject(xhr, text_status, error);
+            });
+        });
+
+        that.error();
+
+    }).always(function() {
+
+        that.sending = null;
+        that.in_flight = false;
+
+        if (that.pending.length) {
+            that.flush();
+        }
+
+    });
+
+};
+
+/**
+ * Returns whether `change` can be sent in the current batch, which is
+ * when its parent exists on the server or is created in the same
+ * batch.
+ */
+SyncQueue.prototype.canSend = function(change) {
+
+    var parent = change.model.syncParent();
+
+    return (
+        change.method == 'delete' ||
+        !change.model.isNew() ||
+        !parent ||
+        !parent.isNew() ||
+        this.isSending(parent)
+    );
+
+};
+
+/**
+ * Returns the operation for `change` in the format of the chart
+ * operations API.
+ */
+SyncQueue.prototype.operation = function(change) {
+
+    var model = change.model;
+    var operation = { model: model.syncModelName };
+
+    if (change.method == 'delete') {
+        operation.action = 'delete';
+        operation.id = model.id;
+        return operation;
+    }
+
+    operation.data = model.toJSON();
+
+    if (model.isNew()) {
+
+        var parent = model.syncParent();
+
+        operation.action = 'create';
+        operation.ref = model.cid;
+
+        if (parent) {
+            operation.parent = parent.isNew() ? '$' + parent.cid : parent.id;
+        }
+
+    } else {
+        operation.action = 'update';
+        operation.id = model.id;
+    }
+
+    return operation;
+
+};
+
+SyncQueue.prototype.resolve = function(change, result) {
+
+    if (!change) {
+        return;
+    }
+
+    _.each(change.waiting, function(sync) {
+        if (sync.options.success) {
+            sync.options.success(result);
+        }
+        sync.deferred.resolve(result);
+    });
+
+};
+
+SyncQueue.prototype.error = function() {
+
+    if (confirm(
+        'A problem occured while synchronizing your changes to ' +
+        'the server. Please refresh the page and try again.'
+    )) {
+        location.reload();
+    }
+
+};
+
+/**
+ * Returns whether there are changes that aren't saved yet.
+ */
+SyncQueue.prototype.hasChanges = function() {
+    return this.in_flight || this.pending.length > 0;
+};
+
+
+var sync_queue = new SyncQueue(
+    GLOBALS.api_root_url + 'chart-operations/' + GLOBALS.chart_data.id + '/',
+    300
+);
+
+// Send the pending changes right away when leaving the page, and warn
+// if they couldn't be saved yet.
+$(window).on('beforeunload', function() {
+
+    sync_queue.flush();
+
+    if (sync_queue.hasChanges()) {
+        return 'Your latest changes are still being saved.';
+    }
+
+});
+
+module.exports = sync_queue;
@@ -5,6 +5,12 @@ var allKeys = require('../../../core/widgets/_all-keys.js');
 
 module.exports = Model.extend({
 
+    syncModelName: 'chord',
+
+    syncParent: function() {
+        return this.get('measure');
+    },
+
     initialize: function(attributes) {
         this.initData();
         this.initListeners();
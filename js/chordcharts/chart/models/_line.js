@@ -4,6 +4,12 @@ var Measures = require('../collections/_measures.js');
 
 module.exports = Model.extend({
 
+    syncModelName: 'line',
+
+    syncParent: function() {
+        return this.get('section');
+    },
+
     initialize: function() {
 
         // Only set measures if it hasn't been set yet. Prevents errors
@@ -94,12 +100,13 @@ module.exports = Model.extend({
 
         var that = this;
 
-        this.save(null, { success: function() {
+        this.save().done(function() {
             that.get('measures').url = that.measuresUrl();
-            that.get('measures').each(function(measure) {
-                measure.saveRecursive();
-            });
-        }});
+        });
+
+        this.get('measures').each(function(measure) {
+            measure.saveRecursive();
+        });
 
     },
 
@@ -4,6 +4,12 @@ var Chords = require('../collections/_chords.js');
 
 module.exports = Model.extend({
 
+    syncModelName: 'measure',
+
+    syncParent: function() {
+        return this.get('line');
+    },
+
     initialize: function() {
         this.initData();
         this.initListeners();
@@ -235,9 +241,10 @@ module.exports = Model.extend({
 
         this.save().done(function() {
             that.get('chords').url = that.chordsUrl();
-            that.get('chords').each(function(chord) {
-                chord.save();
-            });
+        });
+
+        this.get('chords').each(function(chord) {
+            chord.save();
         });
 
     },
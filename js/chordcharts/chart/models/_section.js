@@ -5,6 +5,8 @@ var allKeys = require('../../../core/widgets/_all-keys.js');
 
 module.exports = Model.extend({
 
+    syncModelName: 'section',
+
     initialize: function() {
         this.initData();
         this.initListeners();
@@ -122,12 +124,15 @@ module.exports = Model.extend({
 
         var that = this;
 
-        this.save(null, { success: function() {
+        this.save().done(function() {
             that.get('lines').url = that.linesUrl();
-            that.get('lines').each(function(line) {
-                line.saveRecursive();
-            });
-        }});
+        });
+
+        // The sync queue sends the children in the same batch as this
+        // section, so they don't have to wait for it.
+        this.get('lines').each(function(line) {
+            line.saveRecursive();
+        });
 
     },
 
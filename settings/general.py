@@ -163,7 +163,31 @@ LOGGING = {
 
 TEST_RUNNER = 'django.test.runner.DiscoverRunner'
 
-HAYSTACK_SIGNAL_PROCESSOR = 'haystack.signals.RealtimeSignalProcessor'
+# Saved and deleted objects are queued and indexed with the
+# `process_search_index_queue` command, see
+# `core.helpers.search_index_queue`.
+HAYSTACK_SIGNAL_PROCESSOR = (
+    'core.helpers.search_index_queue.QueuedSignalProcessor'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Rendered charts, see `chordcharts.helpers.render_cache`. Entries
+    # expire after `TIMEOUT` seconds and at most `MAX_ENTRIES` are kept.
+    # The local memory cache is per process, with multiple workers a
+    # shared backend (like the file based cache) saves memory and
+    # renders.
+    'chart_renders': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'chart_renders',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
 
 # Django Auth settings
 AUTH_USER_MODEL = 'users.User'
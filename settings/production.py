@@ -1,3 +1,7 @@
+import os
+from .general import CACHES, DEV_ROOT
+
+
 DEBUG = False
 TEMPLATE_DEBUG = DEBUG
 
@@ -19,3 +23,8 @@ HAYSTACK_CONNECTIONS = {
         'INDEX_NAME': 'haystack',
     },
 }
+
+CACHES['chart_renders'].update({
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(DEV_ROOT, 'cache', 'chart_renders'),
+})
@@ -27,6 +27,16 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
 from django.core.wsgi import get_wsgi_application
 application = get_wsgi_application()
 
+# Build the song name index of this process before the first request.
+from django.db import DatabaseError
+from songs.song_names import get_song_name_index
+
+try:
+    get_song_name_index()
+except DatabaseError:
+    # The database isn't set up yet, the index is built on first use.
+    pass
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)